@@ -31,6 +31,7 @@ gi.require_version('Gtk', '3.0')
 gi.require_version('Gst', '1.0')
 gi.require_version('SugarExt', '1.0')
 gi.require_version('GstVideo', '1.0')
+gi.require_version('GstPbutils', '1.0')
 
 from gi.repository import GObject
 from gi.repository import Gdk
@@ -53,12 +54,16 @@ from sugar3.graphics.toolbutton import ToolButton
 from viewtoolbar import ViewToolbar
 from controls import Controls
 from player import GstPlayer
+from player import list_visualizations
 
 from playlist import PlayList
+from prefetch import Prefetcher
 
 import emptypanel
 
 PLAYLIST_WIDTH_PROP = 1.0 / 3
+# Metadata of the saved playlist telling to play it without video
+AUDIO_ONLY_METADATA = 'jukebox-audio-only'
 
 
 class JukeboxActivity(activity.Activity):
@@ -74,6 +79,10 @@ class JukeboxActivity(activity.Activity):
         self._alert = None
         self._playlist_jobject = None
         self._on_unfullscreen_show_playlist = False
+        # Playlist item queued in the player for gapless playback
+        self._queued_item = None
+        # Reads the file of the next track while the current one plays
+        self._prefetcher = Prefetcher()
 
         self.set_title(_('Jukebox Activity'))
         self.max_participants = 1
@@ -89,6 +98,8 @@ class JukeboxActivity(activity.Activity):
                                    self.__go_fullscreen_cb)
         self._view_toolbar.connect('toggle-playlist',
                                    self.__toggle_playlist_cb)
+        self._view_toolbar.connect('toggle-audio-only',
+                                   self.__toggle_audio_only_cb)
         view_toolbar_button = ToolbarButton(
             page=self._view_toolbar,
             icon_name='toolbar-view')
@@ -123,6 +134,11 @@ class JukeboxActivity(activity.Activity):
         self.playlist_widget.connect('play-index', self.__play_index_cb)
         self.playlist_widget.connect('missing-tracks',
                                      self.__missing_tracks_cb)
+        self.playlist_widget.connect('changed', self.__playlist_changed_cb)
+        self.playlist_widget.connect('load-progress',
+                                     self.__load_progress_cb)
+        self.playlist_widget.connect('playlist-duration',
+                                     self.__playlist_duration_cb)
         self.playlist_widget.set_size_request(
             Gdk.Screen.width() * PLAYLIST_WIDTH_PROP, 0)
         self.playlist_widget.show()
@@ -142,6 +158,16 @@ class JukeboxActivity(activity.Activity):
         move_down.connect("clicked", self._move_down_cb)
         self._playlist_toolbar.insert(move_down, 1)
 
+        scan = ToolButton("view-refresh")
+        scan.set_tooltip(_("Check all tracks"))
+        scan.connect("clicked", self._scan_cb)
+        self._playlist_toolbar.insert(scan, 2)
+
+        total_time = Gtk.ToolItem()
+        self._total_time_label = Gtk.Label(label='')
+        total_time.add(self._total_time_label)
+        self._playlist_toolbar.insert(total_time, 3)
+
         self._playlist_box.pack_end(self._playlist_toolbar, False, False, 0)
         self._video_canvas.pack_start(self._playlist_box, False, False, 0)
 
@@ -151,6 +177,11 @@ class JukeboxActivity(activity.Activity):
         self.player.connect('eos', self.__player_eos_cb)
         self.player.connect('error', self.__player_error_cb)
         self.player.connect('play', self.__player_play_cb)
+        self.player.connect('track-changed', self.__player_track_changed_cb)
+
+        self._view_toolbar.set_visualizations(list_visualizations())
+        self._view_toolbar.connect('visualization-changed',
+                                   self.__visualization_changed_cb)
 
         self.control = Controls(self, toolbar_box.toolbar,
                                 self._control_toolbar)
@@ -200,6 +231,16 @@ class JukeboxActivity(activity.Activity):
     def _move_down_cb(self, button):
         self.playlist_widget.move_down()
 
+    def _scan_cb(self, button):
+        self._total_time_label.set_text('')
+        self.playlist_widget.probe_all()
+
+    def __playlist_duration_cb(self, widget, duration):
+        seconds = int(duration * 10 ** -9)
+        self._total_time_label.set_text(
+            '%d:%02d:%02d' % (seconds // 3600, seconds // 60 % 60,
+                              seconds % 60))
+
     def _configure_cb(self, event=None):
         toolbar = self.get_toolbar_box().toolbar
         if self._stop.get_parent() == toolbar:
@@ -225,13 +266,15 @@ class JukeboxActivity(activity.Activity):
 
         logging.debug('JukeboxActivity notify::active signal received')
 
-        if self.player.player.props.current_uri is not None and \
-                self.player.playing_video():
+        if self.player.has_uri() and self.player.playing_video() and \
+                not self._view_toolbar.get_audio_only():
             if not self.player.is_playing() and self.props.active:
                 self.player.play()
             if self.player.is_playing() and not self.props.active:
                 self.player.pause()
 
+        self._update_video_enabled(self.view_area.get_current_page())
+
     def _init_view_area(self):
         """
         Use a notebook with two pages, one empty an another
@@ -243,15 +286,26 @@ class JukeboxActivity(activity.Activity):
         self.view_area.append_page(self.videowidget, None)
         self._video_canvas.pack_end(self.view_area, expand=True,
                                     fill=True, padding=0)
+        self.view_area.connect('switch-page', self.__switch_page_cb)
+
+    def __switch_page_cb(self, notebook, page, page_num):
+        self._update_video_enabled(page_num)
+
+    def _update_video_enabled(self, page_num):
+        """Only render video while the VideoWidget page is shown and
+        the activity is active; the audio keeps playing meanwhile."""
+        self.player.set_video_enabled(
+            page_num == self.view_area.page_num(self.videowidget) and
+            self.props.active)
 
     def _switch_canvas(self, show_video):
         """Show or hide the video visualization in the canvas.
 
         When hidden, the canvas is filled with an empty widget to
-        ensure redrawing.
+        ensure redrawing. It is always hidden in audio only mode.
 
         """
-        if show_video:
+        if show_video and not self._view_toolbar.get_audio_only():
             self.view_area.set_current_page(1)
         else:
             self.view_area.set_current_page(0)
@@ -338,6 +392,7 @@ class JukeboxActivity(activity.Activity):
         # README: this line is no more necessary because of the
         # .playing_video() method
         # self._switch_canvas(show_video=True)
+        self.player.stats.start('track-switch')
         self.playlist_widget.set_current_playing(index)
 
         path = self.playlist_widget._items[index]['path']
@@ -348,6 +403,7 @@ class JukeboxActivity(activity.Activity):
 
             self.player.set_uri(path)
             self.player.play()
+            self._queue_next_track(index, path)
         else:
             self.songchange('next')
 
@@ -355,6 +411,7 @@ class JukeboxActivity(activity.Activity):
         # README: this line is no more necessary because of the
         # .playing_video() method
         # self._switch_canvas(show_video=True)
+        self.player.stats.start('track-switch')
         self.playlist_widget.set_current_playing(index)
 
         if self.playlist_widget.is_from_journal(path):
@@ -364,8 +421,89 @@ class JukeboxActivity(activity.Activity):
 
         self.player.set_uri(path)
         self.player.play()
+        self._queue_next_track(index, path)
+
+    def _queue_next_track(self, index, current_path):
+        """Queue the next available track in the player so it is
+        played without a gap when the current one finishes.
+
+        Nothing is queued when there is no next track or when it is a
+        different kind of media (e.g. a video after a song); the
+        player then emits 'eos' and songchange() takes over. The file
+        of the next track is prefetched in both cases.
+        """
+        self._queued_item = None
+        self.player.clear_next_uri()
+        self._prefetcher.cancel()
+
+        items = self.playlist_widget._items
+        next_index = index + 1
+        while next_index < len(items) and \
+                not items[next_index]['available']:
+            next_index += 1
+        if next_index >= len(items):
+            return
+
+        item = items[next_index]
+        path = item['path']
+        if not self.playlist_widget.check_available_media(path):
+            return
+        if self.playlist_widget.is_from_journal(path):
+            path = self.playlist_widget.get_path_from_journal(path)
+        self._prefetcher.prefetch(path)
+
+        current_type = mime.get_for_file(current_path).split('/')[0]
+        next_type = mime.get_for_file(path).split('/')[0]
+        if current_type != next_type:
+            logging.debug('Not queueing %s: %s after %s', path,
+                          next_type, current_type)
+            return
+
+        self._queued_item = item
+        self.player.set_next_uri(path)
+
+    def __playlist_changed_cb(self, widget):
+        # The track queued may not be the next one anymore
+        index = self.playlist_widget.get_current_playing()
+        items = self.playlist_widget._items
+        if not self.player.has_uri() or index >= len(items):
+            self._queued_item = None
+            self.player.clear_next_uri()
+            self._prefetcher.cancel()
+            return
+
+        path = items[index]['path']
+        if self.playlist_widget.is_from_journal(path):
+            path = self.playlist_widget.get_path_from_journal(path)
+        self._queue_next_track(index, path)
+        self.control.check_if_next_prev()
+
+    def __player_track_changed_cb(self, widget):
+        item = self._queued_item
+        self._queued_item = None
+        if item is None:
+            return
+
+        # By identity: a file listed twice has equal items
+        index = next((i for i, listed in
+                      enumerate(self.playlist_widget._items)
+                      if listed is item), None)
+        if index is None:
+            # The track was removed from the playlist while queued
+            return
+
+        self.playlist_widget.set_current_playing(index)
+        self.control.check_if_next_prev()
+
+        path = item['path']
+        if self.playlist_widget.is_from_journal(path):
+            path = self.playlist_widget.get_path_from_journal(path)
+        self._queue_next_track(index, path)
 
     def __player_eos_cb(self, widget):
+        # until the first buffer of the next track
+        self.player.stats.start('eos-to-play')
+        self._queued_item = None
         self.songchange('next')
 
     def _show_error_alert(self, title, msg=None):
@@ -377,15 +515,34 @@ class JukeboxActivity(activity.Activity):
         self._alert.connect('response', self._alert_cancel_cb)
         self._alert.show()
 
-    def __mount_added_cb(self, volume_monitor, device):
+    def __mount_added_cb(self, volume_monitor, mount):
         logging.debug('Mountpoint added. Checking...')
         self.remove_alert(self._alert)
-        self.playlist_widget.update()
+        self._update_mount(mount, True)
 
-    def __mount_removed_cb(self, volume_monitor, device):
+    def __mount_removed_cb(self, volume_monitor, mount):
         logging.debug('Mountpoint removed. Checking...')
         self.remove_alert(self._alert)
-        self.playlist_widget.update()
+        self._update_mount(mount, False)
+
+    def _update_mount(self, mount, mounted):
+        mount_path = mount.get_root().get_path()
+        if mount_path is None:
+            # Not a local mount, we don't know which tracks it has
+            self.playlist_widget.update()
+        else:
+            self.playlist_widget.update_mount(mount_path, mounted)
+
+    def __load_progress_cb(self, widget, loaded, finished):
+        logging.debug('%s tracks loaded%s', loaded,
+                      '' if finished else ', loading...')
+        # shown where the total time goes, once it is loaded
+        if finished:
+            self._total_time_label.set_text('')
+        else:
+            self._total_time_label.set_text(
+                _('%s tracks loaded...') % loaded)
+        self.control.check_if_next_prev()
 
     def __missing_tracks_cb(self, widget, tracks):
         self._show_missing_tracks_alert(tracks)
@@ -440,19 +597,33 @@ class JukeboxActivity(activity.Activity):
         logging.error('ERROR MESSAGE: %s', message)
         logging.error('ERROR DETAIL: %s', detail)
 
-        file_path = self.playlist_widget._items[
-            self.playlist_widget.get_current_playing()]['path']
+        item = self._queued_item
+        self._queued_item = None
+        if item is not None and self.player.error_in_next_uri:
+            # The current track played to its end, the queued one
+            # failed before starting
+            self.playlist_widget.set_item_error(item)
+        else:
+            # Not known to be the file: a sink or a decoder may be
+            # missing, it is not marked
+            item = self.playlist_widget._items[
+                self.playlist_widget.get_current_playing()]
+        file_path = item['path']
         mimetype = mime.get_for_file(file_path)
 
         title = _('Error')
         msg = _('This "%s" file can\'t be played') % mimetype
         self._switch_canvas(False)
         self._show_error_alert(title, msg)
+        self.player.stats.stop('error')
 
     def can_close(self):
         # We need to put the Gst.State in NULL so gstreamer can
         # cleanup the pipeline
         self.player.stop()
+        self._prefetcher.stop()
+        self.playlist_widget.close()
+        self.player.stats.dump()
         return True
 
     def read_file(self, file_path):
@@ -462,26 +633,18 @@ class JukeboxActivity(activity.Activity):
         title = self.metadata['title']
         self.playlist_widget.load_file(file_path, title)
 
-    def write_file(self, file_path):
-
-        def write_playlist_to_file(file_path):
-            """Open the file at file_path and write the playlist.
-
-            It is saved in audio/x-mpegurl format.
-
-            """
-
-            list_file = open(file_path, 'w')
-            for uri in self.playlist_widget._items:
-                list_file.write('#EXTINF:%s\n' % uri['title'])
-                list_file.write('%s\n' % uri['path'])
-            list_file.close()
+        self._view_toolbar.set_audio_only(
+            self.metadata.get(AUDIO_ONLY_METADATA) == '1')
 
+    def write_file(self, file_path):
         if not self.metadata['mime_type']:
             self.metadata['mime_type'] = 'audio/x-mpegurl'
 
+        audio_only = '1' if self._view_toolbar.get_audio_only() else '0'
+
         if self.metadata['mime_type'] == 'audio/x-mpegurl':
-            write_playlist_to_file(file_path)
+            self.metadata[AUDIO_ONLY_METADATA] = audio_only
+            self.playlist_widget.write_m3u(file_path)
 
         else:
             if self._playlist_jobject is None:
@@ -491,12 +654,12 @@ class JukeboxActivity(activity.Activity):
             # Add the playlist to the playlist jobject description.
             # This is only done if the activity was not started from a
             # playlist or from scratch:
-            description = ''
-            for uri in self.playlist_widget._items:
-                description += '%s\n' % uri['title']
+            description = ''.join('%s\n' % uri['title']
+                                  for uri in self.playlist_widget._items)
             self._playlist_jobject.metadata['description'] = description
+            self._playlist_jobject.metadata[AUDIO_ONLY_METADATA] = audio_only
 
-            write_playlist_to_file(self._playlist_jobject.file_path)
+            self.playlist_widget.write_m3u(self._playlist_jobject.file_path)
             datastore.write(self._playlist_jobject)
 
     def unfullscreen(self):
@@ -510,6 +673,14 @@ class JukeboxActivity(activity.Activity):
             self._on_unfullscreen_show_playlist = True
         self.fullscreen()
 
+    def __visualization_changed_cb(self, toolbar, name):
+        self.player.set_visualization(name)
+
+    def __toggle_audio_only_cb(self, toolbar):
+        audio_only = toolbar.get_audio_only()
+        self.player.set_audio_only(audio_only)
+        self._switch_canvas(not audio_only and self.player.has_uri())
+
     def __toggle_playlist_cb(self, toolbar):
         if self._view_toolbar._show_playlist.props.active:
             self._playlist_box.show_all()
@@ -0,0 +1,345 @@
+#!/usr/bin/env python3
+# Copyright (C) 2026 Sugar Labs
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA 02111-1307
+# USA
+
+"""Measure the latencies of GstPlayer.
+
+Media files are generated once with audiotestsrc and videotestsrc in
+--media-dir, and played with fakesinks, so no display or sound card
+is needed. Three latencies are measured for every format:
+
+  first-buffer  from set_uri() and play() to the first buffer sunk
+  seek          from seek() to 'seek-done', for both seek modes
+  track-switch  from JukeboxActivity.play_index() to the first buffer
+                of the new track
+
+The contents of the files and the number of repetitions are fixed,
+so the results of different runs can be compared. One JSON object per
+latency and format is printed, with times in milliseconds:
+
+    python3 benchmarks/bench_player.py [--output FILE] [--repeat N]
+"""
+
+import os
+import sys
+import json
+import time
+import logging
+import argparse
+import tempfile
+import threading
+import subprocess
+import statistics
+
+import standins
+standins.install()
+
+from gi.repository import GLib
+from gi.repository import Gst
+
+from player import GstPlayer
+from player import SEEK_KEY_UNIT
+from player import SEEK_ACCURATE
+from activity import JukeboxActivity
+from prefetch import Prefetcher
+
+# Length of the generated media
+MEDIA_SECONDS = 20
+# Files generated for every format, to switch between them
+TRACKS = 3
+# Measures taken of every latency
+REPEAT = 10
+# Longest wait for a buffer or a seek before giving up
+TIMEOUT = 10  # seconds
+
+# name -> pipeline description encoding MEDIA_SECONDS of media
+AUDIO = ('audiotestsrc num-buffers=%d samplesperbuffer=4410 ! '
+         'audio/x-raw,rate=44100,channels=2 ! audioconvert' %
+         (MEDIA_SECONDS * 10))
+VIDEO = ('videotestsrc num-buffers=%d ! '
+         'video/x-raw,width=640,height=480,framerate=25/1 ! videoconvert' %
+         (MEDIA_SECONDS * 25))
+FORMATS = (
+    ('wav', AUDIO + ' ! wavenc'),
+    ('vorbis.ogg', AUDIO + ' ! vorbisenc ! oggmux'),
+    ('opus.ogg', AUDIO + ' ! opusenc ! oggmux'),
+    ('mp3', AUDIO + ' ! lamemp3enc ! id3v2mux'),
+    ('flac', AUDIO + ' ! flacenc'),
+    ('theora.ogv', VIDEO + ' ! theoraenc ! oggmux'),
+    ('vp8.webm', VIDEO + ' ! vp8enc deadline=1 ! webmmux'),
+)
+
+SEEK_MODES = (('key-unit', SEEK_KEY_UNIT), ('accurate', SEEK_ACCURATE))
+# Seek targets, as fractions of the duration
+SEEK_POSITIONS = (0.5, 0.25, 0.75, 0.1, 0.9)
+
+
+def generate(media_dir, name, description):
+    """Return the paths of the files of a format, encoding the ones
+    not generated yet, or None when an element is not installed."""
+    paths = []
+    for track in range(TRACKS):
+        path = os.path.join(media_dir, 'track-%d.%s' % (track, name))
+        paths.append(path)
+        if os.path.exists(path):
+            continue
+
+        try:
+            pipeline = Gst.parse_launch(
+                '%s ! filesink location="%s.part"' % (description, path))
+        except GLib.Error as error:
+            logging.warning('Skipping %s: %s', name, error.message)
+            return None
+
+        pipeline.set_state(Gst.State.PLAYING)
+        message = pipeline.get_bus().timed_pop_filtered(
+            Gst.CLOCK_TIME_NONE,
+            Gst.MessageType.EOS | Gst.MessageType.ERROR)
+        pipeline.set_state(Gst.State.NULL)
+        if message.type == Gst.MessageType.ERROR:
+            logging.warning('Skipping %s: %s', name,
+                            message.parse_error()[0].message)
+            return None
+        os.rename(path + '.part', path)
+    return paths
+
+
+class Sinks(object):
+    """Fakesinks replacing the audio and video outputs of a player,
+    noting when the first buffer arrives after arm()."""
+
+    def __init__(self, player):
+        self._arrived = threading.Event()
+        self._armed = False
+        self.first_buffer = None
+
+        for prop in ('audio-sink', 'video-sink'):
+            sink = Gst.ElementFactory.make('fakesink', None)
+            sink.props.sync = True
+            sink.props.signal_handoffs = True
+            sink.connect('handoff', self.__handoff_cb)
+            player.player.set_property(prop, sink)
+
+    def arm(self):
+        self.first_buffer = None
+        self._arrived.clear()
+        self._armed = True
+
+    def __handoff_cb(self, sink, buffer, pad):
+        # called from a streaming thread
+        if self._armed:
+            self._armed = False
+            self.first_buffer = time.perf_counter()
+            self._arrived.set()
+
+    def wait(self):
+        """Return the time of the first buffer since arm(), or None
+        if none arrived within TIMEOUT."""
+        self._arrived.wait(TIMEOUT)
+        self._armed = False
+        # handle the bus messages posted meanwhile
+        context = GLib.MainContext.default()
+        while context.pending():
+            context.iteration(False)
+        return self.first_buffer
+
+
+def run(loop):
+    timeout_id = GLib.timeout_add_seconds(TIMEOUT, loop.quit)
+    loop.run()
+    GLib.source_remove(timeout_id)
+
+
+class Playlist(object):
+    """The parts of PlayList used by JukeboxActivity.play_index()."""
+
+    def __init__(self, paths):
+        self._items = [{'path': path, 'title': os.path.basename(path),
+                        'available': True} for path in paths]
+        self._current_playing = 0
+
+    def set_current_playing(self, index):
+        self._current_playing = index
+
+    def get_current_playing(self):
+        return self._current_playing
+
+    def check_available_media(self, path):
+        return os.path.exists(path)
+
+    def is_from_journal(self, path):
+        return False
+
+
+class Controls(object):
+
+    def check_if_next_prev(self):
+        pass
+
+
+class Activity(object):
+    """Runs the track switching code of JukeboxActivity on a player,
+    without the activity window, which needs a display."""
+
+    play_index = JukeboxActivity.play_index
+    songchange = JukeboxActivity.songchange
+    _queue_next_track = JukeboxActivity._queue_next_track
+
+    def __init__(self, player, paths):
+        self.player = player
+        self.playlist_widget = Playlist(paths)
+        self.control = Controls()
+        self._queued_item = None
+        self._prefetcher = Prefetcher()
+
+    def emit(self, signal_name):
+        pass
+
+
+def _start(player, sinks, path):
+    sinks.arm()
+    start = time.perf_counter()
+    player.set_uri(path)
+    player.play()
+    first_buffer = sinks.wait()
+    if first_buffer is None:
+        return None
+    return first_buffer - start
+
+
+def bench_first_buffer(player, sinks, paths):
+    latencies = []
+    for i in range(REPEAT):
+        player.stop()
+        latencies.append(_start(player, sinks, paths[0]))
+    player.stop()
+    return {'first-buffer': latencies}
+
+
+def bench_seek(player, sinks, paths):
+    if _start(player, sinks, paths[0]) is None:
+        return {}
+
+    results = {}
+    loop = GLib.MainLoop()
+    done = []
+
+    def seek_done_cb(player):
+        done.append(time.perf_counter())
+        loop.quit()
+
+    handler_id = player.connect('seek-done', seek_done_cb)
+    for mode_name, mode in SEEK_MODES:
+        latencies = []
+        for i in range(REPEAT):
+            fraction = SEEK_POSITIONS[i % len(SEEK_POSITIONS)]
+            location = int(MEDIA_SECONDS * Gst.SECOND * fraction)
+            del done[:]
+            start = time.perf_counter()
+            player.seek(location, mode)
+            if player.is_seeking():
+                run(loop)
+            latencies.append(done[0] - start if done else None)
+        results['seek-' + mode_name] = latencies
+    player.disconnect(handler_id)
+    player.stop()
+    return results
+
+
+def bench_track_switch(player, sinks, paths):
+    activity = Activity(player, paths)
+    sinks.arm()
+    activity.play_index(0)
+    if sinks.wait() is None:
+        return {}
+
+    latencies = []
+    for i in range(REPEAT):
+        sinks.arm()
+        start = time.perf_counter()
+        activity.play_index((i + 1) % len(paths))
+        first_buffer = sinks.wait()
+        latencies.append(None if first_buffer is None
+                         else first_buffer - start)
+    player.stop()
+    activity._prefetcher.stop()
+    return {'track-switch': latencies}
+
+
+BENCHMARKS = (bench_first_buffer, bench_seek, bench_track_switch)
+
+
+def _revision():
+    """Return the git revision measured, to compare runs before and
+    after a change."""
+    try:
+        return subprocess.check_output(
+            ['git', 'describe', '--always', '--dirty'],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            universal_newlines=True).strip()
+    except (EnvironmentError, subprocess.CalledProcessError):
+        return None
+
+
+REVISION = _revision()
+
+
+def summarize(latency, media, times):
+    done = [seconds * 1000 for seconds in times if seconds is not None]
+    result = {'latency': latency, 'format': media,
+              'gstreamer': Gst.version_string(), 'revision': REVISION,
+              'runs': len(times), 'timeouts': len(times) - len(done)}
+    if done:
+        result.update({'min_ms': round(min(done), 3),
+                       'median_ms': round(statistics.median(done), 3),
+                       'mean_ms': round(statistics.mean(done), 3),
+                       'max_ms': round(max(done), 3)})
+    return result
+
+
+def main():
+    global REPEAT
+
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--output', help='append the results to a file')
+    parser.add_argument('--media-dir', default=os.path.join(
+        tempfile.gettempdir(), 'jukebox-bench-media'),
+        help='where the generated media files are kept between runs')
+    parser.add_argument('--repeat', type=int, default=REPEAT)
+    args = parser.parse_args()
+    REPEAT = args.repeat
+
+    if not os.path.isdir(args.media_dir):
+        os.makedirs(args.media_dir)
+
+    player = GstPlayer()
+    sinks = Sinks(player)
+
+    output = open(args.output, 'a') if args.output else sys.stdout
+    for name, description in FORMATS:
+        paths = generate(args.media_dir, name, description)
+        if paths is None:
+            continue
+        for benchmark in BENCHMARKS:
+            for latency, times in benchmark(player, sinks, paths).items():
+                output.write(json.dumps(summarize(latency, name, times)) +
+                             '\n')
+                output.flush()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+# Copyright (C) 2026 Sugar Labs
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA 02111-1307
+# USA
+
+"""Measure how PlayList scales with the number of tracks.
+
+Every operation is run on playlists of each size, with the sugar3
+modules replaced by benchmarks/standins.py. One JSON object per
+operation and size is printed, with the wall time in seconds and the
+peak of memory allocated by Python in bytes, taken for the operation
+only and not for filling the playlist first. GTK needs a display, use
+xvfb-run when there is none:
+
+    xvfb-run python3 benchmarks/bench_playlist.py [--output FILE] [SIZE...]
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import tracemalloc
+
+import standins
+standins.install()
+
+from gi.repository import Gtk
+from gi.repository import Gst
+
+from playlist import PlayList
+
+# The tag reader of PlayList needs it, only player.py does it in the
+# activity
+Gst.init(None)
+
+SIZES = (100, 10000, 100000)
+# Number of moves and deletions measured on each playlist
+OPERATIONS = 100
+
+
+def _wait(playlist):
+    """Run the main loop until the playlist finished loading and
+    checking its tracks."""
+    while playlist.is_loading() or playlist._checks_pending:
+        Gtk.main_iteration()
+    while Gtk.events_pending():
+        Gtk.main_iteration()
+
+
+def _write_m3u(size):
+    # The tracks don't exist, availability checks only fail a stat
+    path = os.path.join(standins.ACTIVITY_ROOT, 'bench-%d.m3u' % size)
+    with open(path, 'w') as m3u_file:
+        for index in range(size):
+            m3u_file.write('#EXTINF:Track %d\n' % index)
+            m3u_file.write('/media/bench/track-%06d.ogg\n' % index)
+    return path
+
+
+def _filled_playlist(m3u_path):
+    playlist = PlayList()
+    playlist.load_file(m3u_path)
+    _wait(playlist)
+    return playlist
+
+
+# Every benchmark prepares a playlist and returns it with the operation
+# measured, a function without arguments; run() only times the latter.
+
+def bench_load_file(size, m3u_path):
+    playlist = PlayList()
+
+    def operation():
+        playlist.load_file(m3u_path)
+        _wait(playlist)
+    return playlist, operation
+
+
+def bench_read_m3u(size, m3u_path):
+    playlist = PlayList()
+    return playlist, lambda: playlist._read_m3u_playlist(m3u_path)
+
+
+def bench_add_track(size, m3u_path):
+    playlist = PlayList()
+    paths = ['/media/bench/track-%06d.ogg' % index for index in range(size)]
+
+    def operation():
+        for index, path in enumerate(paths):
+            playlist._add_track(path, 'Track %d' % index)
+    return playlist, operation
+
+
+def _repeat_on_middle_row(size, m3u_path, operation_name):
+    playlist = _filled_playlist(m3u_path)
+    operation = getattr(playlist, operation_name)
+
+    def repeat():
+        for i in range(min(OPERATIONS, len(playlist) - 1)):
+            playlist.selection.select_path((len(playlist) // 2, ))
+            operation()
+    return playlist, repeat
+
+
+def bench_move_up(size, m3u_path):
+    return _repeat_on_middle_row(size, m3u_path, 'move_up')
+
+
+def bench_move_down(size, m3u_path):
+    return _repeat_on_middle_row(size, m3u_path, 'move_down')
+
+
+def bench_delete_selected_items(size, m3u_path):
+    return _repeat_on_middle_row(size, m3u_path, 'delete_selected_items')
+
+
+def bench_update(size, m3u_path):
+    playlist = _filled_playlist(m3u_path)
+
+    def operation():
+        playlist.update()
+        _wait(playlist)
+    return playlist, operation
+
+
+def bench_write_file(size, m3u_path):
+    playlist = _filled_playlist(m3u_path)
+    out_path = os.path.join(standins.ACTIVITY_ROOT, 'out.m3u')
+    return playlist, lambda: playlist.write_m3u(out_path)
+
+
+BENCHMARKS = (bench_load_file, bench_read_m3u, bench_add_track,
+              bench_move_up, bench_move_down, bench_delete_selected_items,
+              bench_update, bench_write_file)
+
+
+def _measure(benchmark, size, m3u_path, trace):
+    playlist, operation = benchmark(size, m3u_path)
+    try:
+        if trace:
+            tracemalloc.start()
+            operation()
+            result = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+        else:
+            start = time.perf_counter()
+            operation()
+            result = time.perf_counter() - start
+    finally:
+        playlist.close()
+    return result
+
+
+def run(benchmark, size, m3u_path):
+    """Prepare a benchmark and measure its operation only, timed in a
+    first pass and traced for memory in a second one: tracing slows
+    down the allocations."""
+    elapsed = _measure(benchmark, size, m3u_path, False)
+    peak = _measure(benchmark, size, m3u_path, True)
+    return {'benchmark': benchmark.__name__[len('bench_'):],
+            'tracks': size,
+            'seconds': round(elapsed, 6),
+            'peak_bytes': peak}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--output', help='append the results to a file')
+    parser.add_argument('sizes', nargs='*', type=int, default=SIZES)
+    args = parser.parse_args()
+
+    output = open(args.output, 'a') if args.output else sys.stdout
+    for size in args.sizes:
+        m3u_path = _write_m3u(size)
+        for benchmark in BENCHMARKS:
+            output.write(json.dumps(run(benchmark, size, m3u_path)) + '\n')
+            output.flush()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+# Copyright (C) 2026 Sugar Labs
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA 02111-1307
+# USA
+
+"""Compare the ways of filling the playlist TreeView.
+
+'attached' appends one row at a time to a model shown in a realized
+TreeView, as PlayList._add_track used to do; 'detached' is what
+PlayList.add_tracks does for large additions. Each result is printed
+as a JSON line. It needs a display, use xvfb-run when there is none:
+
+    xvfb-run python3 benchmarks/bench_treemodel.py
+"""
+
+import sys
+import json
+import time
+
+import gi
+gi.require_version('Gtk', '3.0')
+
+from gi.repository import Gtk
+
+SIZES = (1000, 10000, 100000)
+
+
+def _make_view():
+    window = Gtk.Window()
+    scrolled = Gtk.ScrolledWindow()
+    treemodel = Gtk.ListStore(object)
+    listview = Gtk.TreeView(model=treemodel)
+    renderer = Gtk.CellRendererText()
+    column = Gtk.TreeViewColumn('Track', renderer)
+    column.set_cell_data_func(renderer, _set_title)
+    listview.append_column(column)
+    scrolled.add(listview)
+    window.add(scrolled)
+    window.set_default_size(400, 600)
+    window.show_all()
+    _flush()
+    return window, listview, treemodel
+
+
+def _set_title(column, cell, model, it, data):
+    cell.set_property('text', model.get_value(it, 0)['title'])
+
+
+def _flush():
+    while Gtk.events_pending():
+        Gtk.main_iteration()
+
+
+def _item(index):
+    return {'path': '/media/%d.ogg' % index,
+            'title': 'Track %d' % index,
+            'available': True}
+
+
+def _fill_attached(listview, treemodel, count):
+    for index in range(count):
+        treemodel.append((_item(index), ))
+
+
+def _fill_detached(listview, treemodel, count):
+    listview.set_model(None)
+    for index in range(count):
+        treemodel.append((_item(index), ))
+    listview.set_model(treemodel)
+
+
+def run(method, count):
+    window, listview, treemodel = _make_view()
+    start = time.perf_counter()
+    method(listview, treemodel, count)
+    # include the relayout done by the view after the insertions
+    _flush()
+    elapsed = time.perf_counter() - start
+    window.destroy()
+    return elapsed
+
+
+def main(sizes):
+    for count in sizes:
+        for name, method in (('attached', _fill_attached),
+                             ('detached', _fill_detached)):
+            elapsed = run(method, count)
+            print(json.dumps({'benchmark': 'treemodel-fill',
+                              'method': name,
+                              'tracks': count,
+                              'seconds': round(elapsed, 6)}))
+            sys.stdout.flush()
+
+
+if __name__ == '__main__':
+    main([int(arg) for arg in sys.argv[1:]] or SIZES)
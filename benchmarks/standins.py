@@ -0,0 +1,174 @@
+# Copyright (C) 2026 Sugar Labs
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA 02111-1307
+# USA
+
+"""Stand-ins for the sugar3 modules used by the activity.
+
+install() puts minimal sugar3 modules in sys.modules, so the activity
+modules can be imported and driven outside of Sugar. The datastore
+keeps its objects in memory; get_activity_root() is a temporary
+directory. The toolbar, alert and chooser widgets are empty classes:
+they can be imported, not shown. The SugarExt typelib, required by
+activity.py, may be missing.
+"""
+
+import os
+import sys
+import types
+import tempfile
+
+import gi
+gi.require_version('Gdk', '3.0')
+gi.require_version('Gtk', '3.0')
+gi.require_version('Gst', '1.0')
+gi.require_version('GstVideo', '1.0')
+gi.require_version('GstPbutils', '1.0')
+
+from gi.repository import GObject
+from gi.repository import Gio
+from gi.repository import Gtk
+
+ACTIVITY_ROOT = tempfile.mkdtemp(prefix='jukebox-bench-')
+
+
+class Signal(object):
+
+    def __init__(self):
+        self._receivers = []
+
+    def connect(self, receiver, **kwargs):
+        self._receivers.append(receiver)
+
+    def send(self, sender, **named):
+        for receiver in self._receivers:
+            receiver(sender, **named)
+
+
+class DSObject(object):
+
+    def __init__(self, object_id, file_path=None, metadata=None):
+        self.object_id = object_id
+        self.file_path = file_path
+        self.metadata = metadata or {}
+
+    def destroy(self):
+        pass
+
+
+class RawObject(DSObject):
+    pass
+
+
+_objects = {}
+
+
+def _get(object_id):
+    return _objects[object_id]
+
+
+def _create():
+    object_id = 'object-%d' % len(_objects)
+    _objects[object_id] = DSObject(object_id)
+    return _objects[object_id]
+
+
+def _write(jobject):
+    _objects[jobject.object_id] = jobject
+    _datastore.updated.send(None, object_id=jobject.object_id)
+
+
+class CellRendererIcon(Gtk.CellRendererPixbuf):
+
+    size = GObject.Property(type=int, default=0)
+
+
+def _get_for_file(file_path):
+    content_type = Gio.content_type_guess(file_path, None)[0]
+    return Gio.content_type_get_mime_type(content_type)
+
+
+# Widgets imported by the activity modules but never created by the
+# benchmarks
+_PLACEHOLDERS = {
+    'sugar3.activity.widgets': ('StopButton', 'ActivityToolbarButton'),
+    'sugar3.graphics.toolbarbox': ('ToolbarBox', 'ToolbarButton'),
+    'sugar3.graphics.toolbutton': ('ToolButton', ),
+    'sugar3.graphics.toggletoolbutton': ('ToggleToolButton', ),
+    'sugar3.graphics.alert': ('Alert', 'ErrorAlert'),
+    'sugar3.graphics.palettemenu': ('PaletteMenuBox', 'PaletteMenuItem'),
+    'sugar3.graphics.objectchooser': ('ObjectChooser', ),
+}
+
+
+# Typelibs of Sugar the activity modules ask for but the benchmarks
+# don't use
+_SUGAR_NAMESPACES = ('SugarExt', )
+_require_version = gi.require_version
+
+
+def _require_sugar_version(namespace, version):
+    try:
+        _require_version(namespace, version)
+    except ValueError:
+        if namespace not in _SUGAR_NAMESPACES:
+            raise
+
+
+def _module(name, **attributes):
+    module = types.ModuleType(name)
+    module.__dict__.update(attributes)
+    sys.modules[name] = module
+    parent, _, child = name.rpartition('.')
+    if parent in sys.modules:
+        setattr(sys.modules[parent], child, module)
+    return module
+
+
+_datastore = _module('sugar3.datastore.datastore',
+                     DSObject=DSObject, RawObject=RawObject,
+                     get=_get, create=_create, write=_write,
+                     created=Signal(), updated=Signal(), deleted=Signal())
+
+
+def install():
+    """Make the stand-ins importable as sugar3 modules."""
+    activity_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    if activity_dir not in sys.path:
+        sys.path.insert(0, activity_dir)
+
+    gi.require_version = _require_sugar_version
+    _module('sugar3')
+    _module('sugar3.mime', get_for_file=_get_for_file)
+    _module('sugar3.datastore', datastore=_datastore)
+    _module('sugar3.activity')
+    _module('sugar3.activity.activity',
+            get_activity_root=lambda: ACTIVITY_ROOT,
+            Activity=type('Activity', (Gtk.Window, ), {}))
+    _module('sugar3.graphics')
+    _module('sugar3.graphics.style')
+    _module('sugar3.graphics.icon', CellRendererIcon=CellRendererIcon,
+            Icon=type('Icon', (object, ), {}))
+    for name, classes in _PLACEHOLDERS.items():
+        _module(name, **dict((class_name, type(class_name, (object, ), {}))
+                             for class_name in classes))
+
+
+def add_object(file_path, metadata=None):
+    """Store a file in the stand-in datastore, return its object id."""
+    jobject = _create()
+    jobject.file_path = file_path
+    jobject.metadata = metadata or {}
+    return jobject.object_id
@@ -27,14 +27,20 @@ from sugar3 import mime
 from sugar3.graphics.toolbutton import ToolButton
 from sugar3.graphics.objectchooser import ObjectChooser
 
+from player import SEEK_KEY_UNIT
+from player import SEEK_ACCURATE
+
 
 class Controls(GObject.GObject):
     """Class to create the Control (play, back, forward,
     add, remove, etc) toolbar"""
 
     SCALE_UPDATE_INTERVAL = 1000
-    SCALE_DURATION_TEXT = 100
-    RESEEK_TIMEOUT = 250  # ms
+    RESEEK_TIMEOUT = 100  # ms
+    # Seek fast while the scale is dragged, to the exact location
+    # when it is released
+    DRAG_SEEK_MODE = SEEK_KEY_UNIT
+    RELEASE_SEEK_MODE = SEEK_ACCURATE
 
     def __init__(self, activity, main_toolbar, secondary_toolbar):
         GObject.GObject.__init__(self)
@@ -47,6 +53,9 @@ class Controls(GObject.GObject):
         self._scale_value_changed_id = -1
         self._scale_reseek_timeout_id = -1
 
+        self.p_position = 0
+        self.p_duration = Gst.CLOCK_TIME_NONE
+
         self.open_button = ToolButton('list-add')
         self.open_button.set_tooltip(_('Add track'))
         self.open_button.show()
@@ -128,6 +137,12 @@ class Controls(GObject.GObject):
 
         self.activity.connect('playlist-finished', self.__playlist_finished_cb)
         self.activity.player.connect('play', self.__player_play)
+        self.activity.player.connect('track-changed', self.__player_play)
+        self.activity.player.connect('duration-known',
+                                     self.__player_duration_known_cb)
+        self.activity.player.connect('seek-done', self.__player_seek_done_cb)
+        # The position is not updated while the activity is not active
+        self.activity.connect('notify::active', self.__notify_active_cb)
 
     def update_layout(self, landscape=True):
         if landscape:
@@ -156,32 +171,65 @@ class Controls(GObject.GObject):
                 control.show()
 
     def __player_play(self, widget):
-        if self._scale_update_id == -1:
-            self._scale_update_id = GObject.timeout_add(
-                self.SCALE_UPDATE_INTERVAL, self.__update_scale_cb)
-
-        # We need to wait for GstPlayer to load the stream's duration
-        GObject.timeout_add(self.SCALE_DURATION_TEXT,
-                            self.__set_scale_duration)
+        self._start_scale_update()
+
+        # The duration is set by 'duration-known' once GstPlayer knows
+        # it, which may already be the case
+        self._set_scale_duration(self.activity.player.get_duration())
+        if self.p_duration == Gst.CLOCK_TIME_NONE:
+            # show the duration known from the media cache meanwhile
+            item = self._get_current_item()
+            if item is not None and item.get('duration', -1) >= 0:
+                self._set_time_label(self.total_time_label,
+                                     item['duration'])
 
         self.set_enabled()
         self.set_button_pause()
 
-    def __set_scale_duration(self):
-        success, self.p_position, self.p_duration = \
-            self.activity.player.query_position()
+    def __player_duration_known_cb(self, widget, duration):
+        self._set_scale_duration(duration)
+
+        item = self._get_current_item()
+        if item is not None and item.get('duration') != duration:
+            self.activity.playlist_widget.update_media_info(
+                item, duration=duration)
+
+    def _get_current_item(self):
+        playlist = self.activity.playlist_widget
+        index = playlist.get_current_playing()
+        if 0 <= index < len(playlist._items):
+            return playlist._items[index]
+        return None
+
+    def _set_scale_duration(self, duration):
+        self.p_duration = duration
+        if duration == Gst.CLOCK_TIME_NONE:
+            self.total_time_label.set_text('')
+            return
+
+        self._set_time_label(self.total_time_label, duration)
+
+    def _set_time_label(self, label, nanoseconds):
+        seconds = nanoseconds * 10 ** -9
+        time = '%2d:%02d' % (int(seconds / 60), int(seconds % 60))
+        label.set_text(time)
+
+    def __notify_active_cb(self, activity, pspec):
+        if not self.activity.props.active:
+            self._stop_scale_update()
+        elif self.activity.player.is_playing():
+            self._start_scale_update()
+            self.__update_scale_cb()
+
+    def _start_scale_update(self):
+        if self._scale_update_id == -1 and self.activity.props.active:
+            self._scale_update_id = GObject.timeout_add(
+                self.SCALE_UPDATE_INTERVAL, self.__update_scale_cb)
 
-        if success and self.p_duration != Gst.CLOCK_TIME_NONE:
-            seconds = self.p_duration * 10 ** -9
-            time = '%2d:%02d' % (int(seconds / 60), int(seconds % 60))
-            self.total_time_label.set_text(time)
-            # Once we set the total_time we don't need to change it
-            # until a new stream is played
-            return False
-        else:
-            # We don't have the stream's duration yet, we need to call
-            # this method again
-            return True
+    def _stop_scale_update(self):
+        if self._scale_update_id != -1:
+            GObject.source_remove(self._scale_update_id)
+            self._scale_update_id = -1
 
     def __open_button_clicked_cb(self, widget):
         self.show_picker_cb()
@@ -250,13 +298,12 @@ class Controls(GObject.GObject):
         if self.activity.player.is_playing():
             self.activity.player.pause()
             self.set_button_play()
-            GObject.source_remove(self._scale_update_id)
-            self._scale_update_id = -1
+            self._stop_scale_update()
         else:
             if self.activity.player.error:
                 self.set_disabled()
             else:
-                if self.activity.player.player.props.current_uri is None:
+                if not self.activity.player.has_uri():
                     # There is no stream selected to be played
                     # yet. Select the first one
                     available = self.activity.playlist_widget.\
@@ -269,8 +316,7 @@ class Controls(GObject.GObject):
                 else:
                     self.activity.player.play()
                     self.activity._switch_canvas(True)
-                    self._scale_update_id = GObject.timeout_add(
-                        self.SCALE_UPDATE_INTERVAL, self.__update_scale_cb)
+                    self._start_scale_update()
 
     def set_button_play(self):
         self.button.set_icon_widget(self.play_image)
@@ -295,9 +341,7 @@ class Controls(GObject.GObject):
             self.activity.player.pause()
 
         # don't timeout-update position during seek
-        if self._scale_update_id != -1:
-            GObject.source_remove(self._scale_update_id)
-            self._scale_update_id = -1
+        self._stop_scale_update()
 
         # make sure we get changed notifies
         if self._scale_value_changed_id == -1:
@@ -311,20 +355,27 @@ class Controls(GObject.GObject):
         self._scale_reseek_timeout_id = GObject.timeout_add(
             self.RESEEK_TIMEOUT, self._reseek)
 
-    def _reseek(self):
+    def _reseek(self, mode=DRAG_SEEK_MODE):
         self._scale_reseek_timeout_id = -1
+        if self.p_duration == Gst.CLOCK_TIME_NONE:
+            return False
         location = int(self.activity.control.hscale.get_value() *
                        self.p_duration / 100)  # in ns
-        self.activity.player.seek(location)
-        # Allow for a preroll
-        self.activity.player.get_state(timeout=50 * Gst.MSECOND)  # 50 ms
+        # GstPlayer coalesces the seeks requested while one is being
+        # done, the scale doesn't wait for them
+        self.activity.player.seek(location, mode)
         return False
 
+    def __player_seek_done_cb(self, widget):
+        # show where the seek landed, unless the scale is being dragged
+        if self._scale_value_changed_id == -1:
+            self.__update_scale_cb()
+
     def __scale_button_release_cb(self, widget, event):
         if self._scale_reseek_timeout_id != -1:
             GObject.source_remove(self._scale_reseek_timeout_id)
             self._scale_reseek_timeout_id = -1
-        self._reseek()
+        self._reseek(self.RELEASE_SEEK_MODE)
 
         widget.disconnect(self._scale_value_changed_id)
         self._scale_value_changed_id = -1
@@ -334,15 +385,14 @@ class Controls(GObject.GObject):
         if self._was_playing:
             self.activity.player.play()
 
-        if self._scale_update_id == -1:
-            self._scale_update_id = GObject.timeout_add(
-                self.SCALE_UPDATE_INTERVAL, self.__update_scale_cb)
+        self._start_scale_update()
 
     def __update_scale_cb(self):
         success, self.p_position, self.p_duration = \
             self.activity.player.query_position()
 
-        if success and self.p_position != Gst.CLOCK_TIME_NONE:
+        if success and self.p_position != Gst.CLOCK_TIME_NONE and \
+                self.p_duration > 0:
             value = self.p_position * 100.0 / self.p_duration
             self.adjustment.set_value(value)
 
@@ -0,0 +1,147 @@
+# Copyright (C) 2026 Sugar Labs
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA 02111-1307
+# USA
+
+"""Report how well the pipeline keeps up with the media.
+
+Diagnostics are off unless the JUKEBOX_DIAGNOSTICS environment
+variable is set: to '1' for the QOS and LATENCY bus messages, or to
+'tracers' to also read the time every element takes to process a
+buffer from the GStreamer latency tracer.
+"""
+
+import os
+import json
+import logging
+import threading
+
+from gi.repository import Gst
+
+ENV = 'JUKEBOX_DIAGNOSTICS'
+TRACERS = 'latency(flags=element)'
+
+
+def enabled():
+    return bool(os.environ.get(ENV))
+
+
+def setup_tracers():
+    """Ask GStreamer for the latency tracer, unless other tracers
+    were asked. It has to be called before Gst.init()."""
+    if os.environ.get(ENV) == 'tracers':
+        os.environ.setdefault('GST_TRACERS', TRACERS)
+
+
+class Diagnostics(object):
+    """Gather the QOS and latency reports of a pipeline, per element,
+    for the current track.
+
+    reset() starts a new track; summary() returns what was gathered
+    since then.
+    """
+
+    def __init__(self, pipeline, dispatcher):
+        self._pipeline = pipeline
+        # The tracer reports come from the streaming threads
+        self._lock = threading.Lock()
+        self._uri = None
+        self.reset(None)
+
+        dispatcher.connect(Gst.MessageType.QOS, self.__on_qos_message)
+        dispatcher.connect(Gst.MessageType.LATENCY,
+                           self.__on_latency_message)
+
+        if os.environ.get(ENV) == 'tracers':
+            Gst.debug_set_threshold_for_name('GST_TRACER',
+                                             Gst.DebugLevel.TRACE)
+            Gst.debug_add_log_function(self.__log_cb, None)
+
+    def reset(self, uri):
+        """Log the summary of the previous track and start gathering
+        the reports of uri."""
+        if self._uri is not None:
+            logging.info('Diagnostics for %s: %s', self._uri,
+                         json.dumps(self.summary(), sort_keys=True))
+        self._uri = uri
+        with self._lock:
+            # element name -> dict of counters
+            self._elements = {}
+            self._latency = None
+
+    def _element(self, name):
+        if name not in self._elements:
+            self._elements[name] = {
+                'qos_messages': 0, 'processed': 0, 'dropped': 0,
+                'max_jitter_ms': 0.0, 'buffers': 0, 'processing_ms': 0.0,
+                'max_processing_ms': 0.0}
+        return self._elements[name]
+
+    def __on_qos_message(self, bus, msg):
+        processed, dropped = msg.parse_qos_stats()[1:]
+        jitter = msg.parse_qos_values()[0]
+        with self._lock:
+            element = self._element(msg.src.get_name())
+            element['qos_messages'] += 1
+            # The counters are totals since the element started
+            if processed >= 0:
+                element['processed'] = processed
+            if dropped >= 0:
+                element['dropped'] = dropped
+            element['max_jitter_ms'] = max(element['max_jitter_ms'],
+                                           jitter / Gst.MSECOND)
+
+    def __on_latency_message(self, bus, msg):
+        query = Gst.Query.new_latency()
+        if self._pipeline.query(query):
+            live, min_latency, max_latency = query.parse_latency()
+            with self._lock:
+                self._latency = min_latency
+
+    def __log_cb(self, category, level, file, function, line, obj,
+                 message, user_data):
+        if category.get_name() != 'GST_TRACER':
+            return
+        structure = Gst.Structure.new_from_string(message.get())
+        if structure is None or structure.get_name() != 'element-latency':
+            return
+
+        name = structure.get_string('element')
+        if name is None:
+            return
+        processing = structure.get_value('time') / Gst.MSECOND
+        with self._lock:
+            element = self._element(name)
+            element['buffers'] += 1
+            element['processing_ms'] += processing
+            element['max_processing_ms'] = max(
+                element['max_processing_ms'], processing)
+
+    def summary(self):
+        """Return a dict with the pipeline latency and, per element,
+        the buffers dropped and the time spent processing them."""
+        with self._lock:
+            elements = {}
+            for name, counters in self._elements.items():
+                element = dict(counters)
+                if element['buffers']:
+                    element['mean_processing_ms'] = \
+                        element['processing_ms'] / element['buffers']
+                elements[name] = element
+
+            latency = self._latency
+        if latency is not None:
+            latency = latency / Gst.MSECOND
+        return {'latency_ms': latency, 'elements': elements}
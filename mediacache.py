@@ -0,0 +1,112 @@
+# Copyright (C) 2026 Sugar Labs
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA 02111-1307
+# USA
+
+import time
+import logging
+import sqlite3
+
+from gi.repository import GObject
+
+# Entries kept in the cache, the least recently used go first
+MAX_ENTRIES = 10000
+# Delay before the changes are written to disk
+COMMIT_DELAY = 5  # seconds
+
+FIELDS = ('mime', 'duration', 'title', 'artist', 'album', 'available')
+
+
+class MediaCache(object):
+    """Information about media files kept between sessions.
+
+    Entries are keyed by file path or journal:// path, and are only
+    valid while the file has the same modification time and size.
+    """
+
+    def __init__(self, path, max_entries=MAX_ENTRIES):
+        self._max_entries = max_entries
+        self._commit_id = -1
+
+        self.hits = 0
+        self.misses = 0
+
+        self._db = sqlite3.connect(path)
+        self._db.execute(
+            'CREATE TABLE IF NOT EXISTS media ('
+            'key TEXT PRIMARY KEY, mtime REAL, size INTEGER, '
+            'mime TEXT, duration INTEGER, title TEXT, artist TEXT, '
+            'album TEXT, available INTEGER, used REAL)')
+        self._db.execute(
+            'CREATE INDEX IF NOT EXISTS media_used ON media (used)')
+
+    def get(self, key, mtime, size):
+        """Return a dict with the fields known for key, or None."""
+        row = self._db.execute(
+            'SELECT %s FROM media WHERE key = ? AND mtime = ? AND size = ?'
+            % ', '.join(FIELDS), (key, mtime, size)).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        self._db.execute('UPDATE media SET used = ? WHERE key = ?',
+                         (time.time(), key))
+        self._queue_commit()
+        return dict((field, value) for field, value in zip(FIELDS, row)
+                    if value is not None)
+
+    def put(self, key, mtime, size, **fields):
+        """Store fields for key, keeping the other fields known for
+        the same version of the file."""
+        entry = self._db.execute(
+            'SELECT %s FROM media WHERE key = ? AND mtime = ? AND size = ?'
+            % ', '.join(FIELDS), (key, mtime, size)).fetchone()
+        values = dict(zip(FIELDS, entry or [None] * len(FIELDS)))
+        values.update((field, fields[field]) for field in FIELDS
+                      if field in fields)
+
+        self._db.execute(
+            'INSERT OR REPLACE INTO media VALUES (?, ?, ?, %s, ?)'
+            % ', '.join('?' * len(FIELDS)),
+            [key, mtime, size] + [values[field] for field in FIELDS] +
+            [time.time()])
+        self._queue_commit()
+
+    def _queue_commit(self):
+        if self._commit_id == -1:
+            self._commit_id = GObject.timeout_add_seconds(
+                COMMIT_DELAY, self.__commit_cb)
+
+    def __commit_cb(self):
+        self._commit_id = -1
+        self.commit()
+        return False
+
+    def commit(self):
+        # remove the least recently used entries over the limit
+        self._db.execute(
+            'DELETE FROM media WHERE key IN (SELECT key FROM media '
+            'ORDER BY used DESC LIMIT -1 OFFSET ?)', (self._max_entries, ))
+        self._db.commit()
+
+    def close(self):
+        if self._commit_id != -1:
+            GObject.source_remove(self._commit_id)
+            self._commit_id = -1
+        self.commit()
+        self._db.close()
+        logging.debug('Media cache: %s hits, %s misses',
+                      self.hits, self.misses)
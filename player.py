@@ -16,6 +16,8 @@
 # USA
 
 import logging
+import threading
+from collections import Counter
 
 from gi.repository import Gst
 from gi.repository import GObject
@@ -24,9 +26,117 @@ from gi.repository import GObject
 # respectively:
 from gi.repository import GdkX11, GstVideo
 
-# Initialize GStreamer
+import diagnostics
+from stats import PlaybackStats
+
+# Initialize GStreamer, the tracers are set up before
+diagnostics.setup_tracers()
 Gst.init(None)
 
+# Seek modes: to the closest key unit, fast, or to the exact location
+SEEK_KEY_UNIT = Gst.SeekFlags.FLUSH | Gst.SeekFlags.KEY_UNIT
+SEEK_ACCURATE = Gst.SeekFlags.FLUSH | Gst.SeekFlags.ACCURATE
+
+# playbin flags rendering the video and the visualisation
+PLAY_FLAG_VIDEO = 1
+PLAY_FLAG_VIS = 8
+
+# Visualisation used when it is installed, and the largest frames it
+# may render: visualisers are costly at high sizes and rates
+DEFAULT_VISUALIZATION = 'goom'
+VIS_MAX_WIDTH = 480
+VIS_MAX_HEIGHT = 360
+VIS_MAX_FRAMERATE = 15
+
+# Delay before the video is scaled to a new size of the VideoWidget,
+# so it is not renegotiated at every step of a resize
+VIDEO_RESIZE_DELAY = 200  # ms
+
+# Time paused before the decoders and sinks are released, 0 to keep
+# them
+IDLE_RELEASE_TIMEOUT = 120  # seconds
+
+
+def list_visualizations():
+    """Returns the (element name, description) of the installed
+    visualisation elements"""
+    # There is no factory type for them, they are found by their klass
+    # (e.g. "Visualization" or "Visualization/Audio")
+    factories = Gst.ElementFactory.list_get_elements(
+        Gst.ELEMENT_FACTORY_TYPE_ANY, Gst.Rank.NONE)
+    return sorted((factory.get_name(),
+                   factory.get_metadata(Gst.ELEMENT_METADATA_LONGNAME))
+                  for factory in factories
+                  if 'Visualization' in
+                  (factory.get_metadata(Gst.ELEMENT_METADATA_KLASS) or ''))
+
+
+class BusDispatcher(object):
+    """Call handlers for the bus messages of the types they are
+    connected to.
+
+    Only the types connected are watched, so no Python code runs for
+    the other messages. The messages handled are counted by type.
+    """
+
+    def __init__(self, bus):
+        self._bus = bus
+        self._bus.add_signal_watch()
+        # message type name -> handlers
+        self._handlers = {}
+        self.counts = Counter()
+
+        self._sync_handler = None
+        self._sync_handler_id = None
+        # arm_sync() runs in the main thread and the handler in the
+        # streaming threads; the serial tells a handler done with an
+        # older arm_sync() not to disarm a newer one
+        self._sync_lock = threading.Lock()
+        self._sync_serial = 0
+
+    def connect(self, message_type, handler):
+        name = Gst.message_type_get_name(message_type)
+        if name not in self._handlers:
+            self._handlers[name] = []
+            self._bus.connect('message::' + name, self.__message_cb, name)
+        self._handlers[name].append(handler)
+
+    def __message_cb(self, bus, msg, name):
+        self.counts[name] += 1
+        for handler in self._handlers[name]:
+            handler(bus, msg)
+
+    def set_sync_element_handler(self, handler):
+        """Set the handler of the element messages, called from the
+        streaming threads. It is only called after arm_sync(), until
+        it returns True."""
+        self._sync_handler = handler
+
+    def arm_sync(self):
+        with self._sync_lock:
+            self._sync_serial += 1
+            if self._sync_handler_id is None:
+                self._bus.enable_sync_message_emission()
+                self._sync_handler_id = self._bus.connect(
+                    'sync-message::element', self.__sync_message_cb)
+
+    def disarm_sync(self, serial=None):
+        with self._sync_lock:
+            if serial is not None and serial != self._sync_serial:
+                # armed again meanwhile
+                return
+            if self._sync_handler_id is not None:
+                self._bus.disconnect(self._sync_handler_id)
+                self._sync_handler_id = None
+                self._bus.disable_sync_message_emission()
+
+    def __sync_message_cb(self, bus, msg):
+        self.counts['sync-element'] += 1
+        with self._sync_lock:
+            serial = self._sync_serial
+        if self._sync_handler(bus, msg):
+            self.disarm_sync(serial)
+
 
 class GstPlayer(GObject.GObject):
 
@@ -34,102 +144,535 @@ class GstPlayer(GObject.GObject):
         'error': (GObject.SignalFlags.RUN_FIRST, None, [str, str]),
         'eos': (GObject.SignalFlags.RUN_FIRST, None, []),
         'play': (GObject.SignalFlags.RUN_FIRST, None, []),
+        'track-changed': (GObject.SignalFlags.RUN_FIRST, None, []),
+        'duration-known': (GObject.SignalFlags.RUN_FIRST, None, [object]),
+        'seek-done': (GObject.SignalFlags.RUN_FIRST, None, []),
+        'state-changed': (GObject.SignalFlags.RUN_FIRST, None, [object]),
     }
 
-    def __init__(self):
+    def __init__(self, idle_release_timeout=IDLE_RELEASE_TIMEOUT):
         GObject.GObject.__init__(self)
 
-        self.playing = False
         self.error = False
+        # Whether the last error came from the stream queued by
+        # set_next_uri(), after playbin switched to it
+        self.error_in_next_uri = False
 
-        # Create GStreamer pipeline
-        self.pipeline = Gst.Pipeline()
-        # Create bus to get events from GStreamer pipeline
-        self.bus = self.pipeline.get_bus()
-        self.bus.add_signal_watch()
+        # URI set by set_uri(), or the gapless one playing after it
+        self._uri = None
+
+        # State asked by play(), pause(), stop() or set_uri(), and the
+        # last one the pipeline reached. set_state() returns before
+        # the pipeline gets there, the bus tells when it did.
+        self._target_state = Gst.State.NULL
+        self._current_state = Gst.State.NULL
+        # Functions to call once the target state is reached
+        self._state_callbacks = []
+
+        # URI queued to be played gaplessly after the current one,
+        # see __on_about_to_finish
+        self._next_uri = None
+        self._next_uri_started = False
+
+        # Duration of the current stream, updated from the bus
+        self._duration = Gst.CLOCK_TIME_NONE
+
+        # Seek being done by the pipeline, and the last one requested
+        # meanwhile, see seek()
+        self._seeking = False
+        self._pending_seek = None
 
-        self.bus.connect('message::eos', self.__on_eos_message)
-        self.bus.connect('message::error', self.__on_error_message)
+        # Time taken by set_uri(), the state changes, seeks and until
+        # the first buffer of a stream
+        self.stats = PlaybackStats()
 
-        # This is needed to make the video output in our DrawingArea
-        self.bus.enable_sync_message_emission()
-        self.bus.connect('sync-message::element', self.__on_sync_message)
+        # After a long pause the pipeline goes to NULL, and play()
+        # restores it at the position it was paused, see pause()
+        self._idle_release_timeout = idle_release_timeout
+        self._idle_release_id = -1
+        self._released_position = None
+        self._resuming = False
 
-        # Create GStreamer elements
+        # playbin is a pipeline itself: states, seeks and queries all
+        # go to it, without a bin around it
         self.player = Gst.ElementFactory.make('playbin', None)
-        # FIXME: visualisation is in separate window
-        self.player.props.flags |= 8
-        self.pipeline.add(self.player)
+        # Create bus to get events from GStreamer pipeline
+        self.bus = self.player.get_bus()
+        self.dispatcher = BusDispatcher(self.bus)
+
+        self.dispatcher.connect(Gst.MessageType.EOS, self.__on_eos_message)
+        self.dispatcher.connect(Gst.MessageType.ERROR,
+                                self.__on_error_message)
+        self.dispatcher.connect(Gst.MessageType.STREAM_START,
+                                self.__on_stream_start_message)
+        self.dispatcher.connect(Gst.MessageType.DURATION_CHANGED,
+                                self.__on_duration_changed_message)
+        self.dispatcher.connect(Gst.MessageType.ASYNC_DONE,
+                                self.__on_async_done_message)
+        self.dispatcher.connect(Gst.MessageType.STATE_CHANGED,
+                                self.__on_state_changed_message)
+
+        # This is needed to make the video output in our DrawingArea.
+        # It is only armed until a video sink got the window handle.
+        self.dispatcher.set_sync_element_handler(self.__on_sync_message)
+        self.dispatcher.arm_sync()
+
+        # The visualisation is rendered in the VideoWidget, through
+        # the same prepare-window-handle message as the video
+        self.visualization = None
+        names = [name for name, description in list_visualizations()]
+        if names:
+            if DEFAULT_VISUALIZATION in names:
+                self.set_visualization(DEFAULT_VISUALIZATION)
+            else:
+                self.set_visualization(names[0])
+        self.player.props.flags |= PLAY_FLAG_VIS
+        # see set_video_enabled() and set_audio_only()
+        self._video_enabled = True
+        self._audio_only = False
+
+        # Frames larger than the VideoWidget are scaled down before the
+        # sink, see set_video_size()
+        self._video_size = None
+        self._video_resize_id = -1
+        # videoconvert only converts the formats videoscale can't scale
+        convert = Gst.ElementFactory.make('videoconvert', None)
+        scale = Gst.ElementFactory.make('videoscale', None)
+        self._video_caps = Gst.ElementFactory.make('capsfilter', None)
+        video_filter = Gst.Bin.new('video-filter')
+        video_filter.add(convert)
+        video_filter.add(scale)
+        video_filter.add(self._video_caps)
+        convert.link(scale)
+        scale.link(self._video_caps)
+        video_filter.add_pad(Gst.GhostPad.new(
+            'sink', convert.get_static_pad('sink')))
+        video_filter.add_pad(Gst.GhostPad.new(
+            'src', self._video_caps.get_static_pad('src')))
+        self.player.props.video_filter = video_filter
+        self.player.connect('about-to-finish', self.__on_about_to_finish)
+
+        # QOS and latency reports, see diagnostics.py
+        self.diagnostics = None
+        if diagnostics.enabled():
+            self.diagnostics = diagnostics.Diagnostics(self.player,
+                                                       self.dispatcher)
+        self.player.connect('audio-changed', self.__on_streams_changed,
+                            'get-audio-pad')
+        self.player.connect('video-changed', self.__on_streams_changed,
+                            'get-video-pad')
 
     def init_view_area(self, videowidget):
         videowidget.realize()
         self.videowidget = videowidget
         self.videowidget_xid = videowidget.get_window().get_xid()
+        videowidget.connect('size-allocate', self.__videowidget_allocate_cb)
+
+    def __videowidget_allocate_cb(self, widget, allocation):
+        # Called for resizes, fullscreen and orientation changes
+        if self._video_resize_id != -1:
+            GObject.source_remove(self._video_resize_id)
+        self._video_resize_id = GObject.timeout_add(
+            VIDEO_RESIZE_DELAY, self.__video_resize_cb)
+
+    def __video_resize_cb(self):
+        self._video_resize_id = -1
+        allocation = self.videowidget.get_allocation()
+        scale = self.videowidget.get_scale_factor()
+        self.set_video_size(allocation.width * scale,
+                            allocation.height * scale)
+        return False
+
+    def set_video_size(self, width, height):
+        """Scale down the video frames larger than width x height,
+        keeping their aspect ratio. Smaller frames are not scaled."""
+        if (width, height) == self._video_size or width < 1 or height < 1:
+            return
+        self._video_size = (width, height)
+        logging.debug('Video size: %dx%d', width, height)
+        # A new caps makes the pipeline renegotiate the size
+        self._video_caps.props.caps = Gst.Caps.from_string(
+            'video/x-raw, width=(int)[1, %d], height=(int)[1, %d], '
+            'pixel-aspect-ratio=(fraction)1/1' % (width, height))
 
     def __on_error_message(self, bus, msg):
+        self.stats.start('error')
+        # stop() forgets the queued stream
+        self.error_in_next_uri = self._next_uri_started
         self.stop()
-        self.playing = False
         self.error = True
         err, debug = msg.parse_error()
         self.emit('error', err, debug)
 
     def __on_eos_message(self, bus, msg):
         logging.debug('SIGNAL: eos')
-        self.playing = False
+        self._set_state(Gst.State.PAUSED)
+        self._reset_diagnostics(None)
         self.emit('eos')
 
+    def __on_about_to_finish(self, playbin):
+        # This is called from a streaming thread, right before the
+        # current stream runs out of data. Setting the 'uri' here
+        # makes playbin switch to the next stream without going
+        # through EOS and without tearing down the pipeline.
+        uri = self._next_uri
+        if uri is None:
+            return
+        self._next_uri = None
+        self._next_uri_started = True
+        self._uri = uri
+        logging.debug('Gapless URI: %s', uri)
+        playbin.set_property('uri', uri)
+
+    def __on_stream_start_message(self, bus, msg):
+        if self._next_uri_started:
+            self._next_uri_started = False
+            self._duration = Gst.CLOCK_TIME_NONE
+            self._reset_diagnostics(self.player.props.current_uri)
+            self.emit('track-changed')
+            self._update_duration()
+
+    def __on_duration_changed_message(self, bus, msg):
+        # The cached duration is no longer valid
+        self._duration = Gst.CLOCK_TIME_NONE
+        self._update_duration()
+
+    def __on_async_done_message(self, bus, msg):
+        if self._duration == Gst.CLOCK_TIME_NONE:
+            self._update_duration()
+
+        # Before the state callbacks, which may seek: this ASYNC_DONE
+        # does not finish their seeks
+        if self._seeking:
+            self._seeking = False
+            self.stats.stop('seek')
+            if self._pending_seek is not None:
+                location, mode = self._pending_seek
+                self._pending_seek = None
+                self._do_seek(location, mode)
+            if not self._seeking:
+                self.emit('seek-done')
+
+        self._check_state()
+
+    def __on_state_changed_message(self, bus, msg):
+        if msg.src == self.player:
+            self._check_state()
+
+    def _set_state(self, state, callback=None):
+        """Ask the pipeline to go to state, and call callback once it
+        is there. Callbacks waiting for another state are dropped."""
+        if state != self._target_state:
+            self._state_callbacks = []
+        self._target_state = state
+        if callback is not None:
+            self._state_callbacks.append(callback)
+
+        if state in (Gst.State.PAUSED, Gst.State.PLAYING):
+            self.stats.start('state-change')
+        ret = self.player.set_state(state)
+        if ret == Gst.StateChangeReturn.FAILURE:
+            # The reason comes as an ERROR message
+            logging.error('Can not set the pipeline to %s', state)
+        elif ret != Gst.StateChangeReturn.ASYNC:
+            # Done already, and no message comes when the state was
+            # already reached or the bus is flushed, going to NULL
+            self._state_reached(state)
+
+    def _check_state(self):
+        ret, current, pending = self.player.get_state(0)
+        if ret != Gst.StateChangeReturn.ASYNC and \
+                pending == Gst.State.VOID_PENDING:
+            self._state_reached(current)
+
+    def _state_reached(self, state):
+        changed = state != self._current_state
+        self._current_state = state
+        if state != self._target_state:
+            return
+
+        self.stats.stop('state-change')
+        callbacks = self._state_callbacks
+        self._state_callbacks = []
+        for callback in callbacks:
+            callback()
+        if changed:
+            logging.debug('State reached: %s', state)
+            self.emit('state-changed', state)
+
+    def __on_streams_changed(self, playbin, pad_signal):
+        # This is called from a streaming thread. The first buffer
+        # going through the pad of the first stream is the first one
+        # decoded.
+        pad = playbin.emit(pad_signal, 0)
+        if pad is not None:
+            pad.add_probe(Gst.PadProbeType.BUFFER, self.__first_buffer_probe)
+
+    def __first_buffer_probe(self, pad, info):
+        self.stats.stop('first-buffer')
+        # The activity starts measuring these, they end here
+        self.stats.stop('track-switch')
+        self.stats.stop('eos-to-play')
+        return Gst.PadProbeReturn.REMOVE
+
+    def _update_duration(self):
+        success, duration = self.player.query_duration(Gst.Format.TIME)
+        if success and duration >= 0 and duration != self._duration:
+            self._duration = duration
+            self.emit('duration-known', duration)
+
     def __on_sync_message(self, bus, msg):
         if msg.get_structure().get_name() == 'prepare-window-handle':
             msg.src.set_window_handle(self.videowidget_xid)
+            # the sink keeps it, until a new stream or a new sink
+            return True
+        return False
 
     def set_uri(self, uri):
-        self.pipeline.set_state(Gst.State.READY)
+        self.stats.start('set-uri')
+        self.stats.start('first-buffer')
+        self.clear_next_uri()
+        self._duration = Gst.CLOCK_TIME_NONE
+        self._cancel_seek()
+        self._cancel_idle_release()
+        self._released_position = None
+        self._resuming = False
+        self.dispatcher.arm_sync()
+        self._set_state(Gst.State.READY)
         # gstreamer needs the 'file://' prefix
         uri = 'file://' + uri
         logging.debug('URI: %s', uri)
+        self._uri = uri
         self.player.set_property('uri', uri)
+        self._reset_diagnostics(uri)
+        self.stats.stop('set-uri')
+
+    def set_next_uri(self, uri):
+        """Queue the file to be played when the current one finishes.
+
+        The stream is switched without emitting 'eos'; 'track-changed'
+        is emitted instead once the new stream starts.
+        """
+        self._next_uri = 'file://' + uri
+        self._next_uri_started = False
+
+    def clear_next_uri(self):
+        self._next_uri = None
+        self._next_uri_started = False
+
+    def set_visualization(self, name, width=VIS_MAX_WIDTH,
+                          height=VIS_MAX_HEIGHT,
+                          framerate=VIS_MAX_FRAMERATE):
+        """Render the audio with the visualisation element name, in
+        frames of at most width x height, at most framerate per
+        second."""
+        visualizer = Gst.ElementFactory.make(name, None)
+        if visualizer is None:
+            logging.error('Visualisation %s is not installed', name)
+            return
+
+        capsfilter = Gst.ElementFactory.make('capsfilter', None)
+        capsfilter.props.caps = Gst.Caps.from_string(
+            'video/x-raw, width=(int)[16, %d], height=(int)[16, %d], '
+            'framerate=(fraction)[1/1, %d/1]' % (width, height, framerate))
+
+        vis_bin = Gst.Bin.new(None)
+        vis_bin.add(visualizer)
+        vis_bin.add(capsfilter)
+        visualizer.link(capsfilter)
+        vis_bin.add_pad(Gst.GhostPad.new(
+            'sink', visualizer.get_static_pad('sink')))
+        vis_bin.add_pad(Gst.GhostPad.new(
+            'src', capsfilter.get_static_pad('src')))
+
+        logging.debug('Visualisation: %s', name)
+        self.dispatcher.arm_sync()
+        self.player.props.vis_plugin = vis_bin
+        self.visualization = name
+
+    def set_video_enabled(self, enabled):
+        """Render the video and visualisation, or only decode the
+        audio while nobody can see them."""
+        self._video_enabled = enabled
+        self._update_video_flags()
+
+    def set_audio_only(self, audio_only):
+        """Don't decode the video of any stream, whether it can be
+        seen or not"""
+        self._audio_only = audio_only
+        self._update_video_flags()
+
+    def _update_video_flags(self):
+        enabled = self._video_enabled and not self._audio_only
+        flags = self.player.props.flags
+        if enabled:
+            new_flags = flags | PLAY_FLAG_VIDEO | PLAY_FLAG_VIS
+        else:
+            new_flags = flags & ~(PLAY_FLAG_VIDEO | PLAY_FLAG_VIS)
+        if new_flags == flags:
+            return
+
+        logging.debug('Video %s', 'enabled' if enabled else 'disabled')
+        if enabled:
+            # playbin may plug a new video sink
+            self.dispatcher.arm_sync()
+        self.player.props.flags = new_flags
+        if enabled and self.playing_video() and not self.is_playing():
+            # When playing, playsink plugs the video sink on its own;
+            # when paused a flushing seek to the current position
+            # prerolls it, so the frame shows again right away
+            success, position = self.player.query_position(Gst.Format.TIME)
+            if success:
+                self.seek(position, SEEK_ACCURATE)
+
+    def _reset_diagnostics(self, uri):
+        if self.diagnostics is not None:
+            self.diagnostics.reset(uri)
+
+    def get_diagnostics(self):
+        """Returns the QOS and latency summary of the current track, or
+        None when the diagnostics are off"""
+        if self.diagnostics is None:
+            return None
+        return self.diagnostics.summary()
+
+    def has_uri(self):
+        "Returns whether a stream was set to be played"
+        return self._uri is not None
 
     def query_position(self):
-        "Returns a (position, duration) tuple"
+        "Returns a (success, position, duration) tuple"
+
+        # The duration comes from the bus, only the position is queried
+        if self._released_position is not None:
+            success, position = True, self._released_position
+        else:
+            success, position = self.player.query_position(Gst.Format.TIME)
+        duration = self._duration
 
-        p_success, position = self.player.query_position(Gst.Format.TIME)
-        d_success, duration = self.player.query_duration(Gst.Format.TIME)
+        return (success and duration != Gst.CLOCK_TIME_NONE,
+                position, duration)
 
-        return (p_success and d_success, position, duration)
+    def get_duration(self):
+        "Returns the duration of the stream, or Gst.CLOCK_TIME_NONE"
+        return self._duration
 
-    def seek(self, location):
+    def seek(self, location, mode=SEEK_KEY_UNIT):
         """
         @param location: time to seek to, in nanoseconds
+        @param mode: SEEK_KEY_UNIT or SEEK_ACCURATE
+
+        This does not wait for the seek to be done, 'seek-done' is
+        emitted then. Seeks requested meanwhile are coalesced: only
+        the last one is done.
         """
 
+        if self._released_position is not None:
+            # done when the pipeline is restored
+            self._released_position = location
+            self.emit('seek-done')
+            return
+
+        if self._seeking:
+            self._pending_seek = (location, mode)
+            return
+
+        self._do_seek(location, mode)
+
+    def _do_seek(self, location, mode):
         logging.debug('Seek: %s ns', location)
+        self.stats.start('seek')
+        # The pipeline posts ASYNC_DONE once the seek is done
+        self._seeking = self.player.seek_simple(Gst.Format.TIME, mode,
+                                                location)
+
+    def _cancel_seek(self):
+        self._seeking = False
+        self._pending_seek = None
+        self.stats.cancel('seek')
 
-        self.pipeline.seek_simple(Gst.Format.TIME,
-                                  Gst.SeekFlags.FLUSH | Gst.SeekFlags.KEY_UNIT,
-                                  location)
+    def is_seeking(self):
+        return self._seeking
 
-    def pause(self):
+    def pause(self, callback=None):
+        """Pause, callback is called once the pipeline is paused"""
         logging.debug("pausing player")
-        self.pipeline.set_state(Gst.State.PAUSED)
-        self.playing = False
+        if self._resuming:
+            # don't play once restored
+            self._resuming = False
+            self._state_callbacks = []
+        self._set_state(Gst.State.PAUSED, callback)
 
-    def play(self):
+        self._cancel_idle_release()
+        if self._idle_release_timeout > 0:
+            self._idle_release_id = GObject.timeout_add_seconds(
+                self._idle_release_timeout, self.__idle_release_cb)
+
+    def __idle_release_cb(self):
+        self._idle_release_id = -1
+        if self._released_position is None:
+            success, position = self.player.query_position(Gst.Format.TIME)
+            if not success:
+                return False
+            self._released_position = position
+        logging.debug('Paused for long, releasing the pipeline at %s ns',
+                      self._released_position)
+        self._cancel_seek()
+        self._set_state(Gst.State.NULL)
+        return False
+
+    def _cancel_idle_release(self):
+        if self._idle_release_id != -1:
+            GObject.source_remove(self._idle_release_id)
+            self._idle_release_id = -1
+
+    def play(self, callback=None):
+        """Play, callback is called once the pipeline is playing"""
         logging.debug("playing player")
-        self.pipeline.set_state(Gst.State.PLAYING)
-        self.playing = True
         self.error = False
+        self._cancel_idle_release()
+        if self._released_position is not None:
+            # The pipeline was released, it has to preroll again to
+            # seek back to where it was
+            self._resuming = True
+            self.dispatcher.arm_sync()
+            self._set_state(Gst.State.PAUSED,
+                            lambda: self._resume(callback))
+        else:
+            self._set_state(Gst.State.PLAYING, callback)
         self.emit('play')
 
+    def _resume(self, callback):
+        if not self._resuming:
+            # play() was called again while prerolling
+            return
+        position = self._released_position
+        self._released_position = None
+        self._resuming = False
+        self.seek(position, SEEK_ACCURATE)
+        self._set_state(Gst.State.PLAYING, callback)
+
     def stop(self):
-        self.playing = False
-        self.pipeline.set_state(Gst.State.NULL)
+        logging.debug('Bus messages handled: %s', dict(self.dispatcher.counts))
+        self.clear_next_uri()
+        self._cancel_seek()
+        self._cancel_idle_release()
+        self._released_position = None
+        self._resuming = False
+        self.stats.cancel('state-change', 'first-buffer', 'track-switch',
+                          'eos-to-play')
+        self._set_state(Gst.State.NULL)
+        self._reset_diagnostics(None)
         logging.debug("stopped player")
 
-    def get_state(self, timeout=1):
-        return self.player.get_state(timeout=timeout)
+    def get_state(self):
+        "Returns the state the pipeline is in, it may be changing"
+        return self._current_state
 
     def is_playing(self):
-        return self.playing
+        """Returns whether the player was asked to play, even if the
+        pipeline is not playing yet"""
+        return self._target_state == Gst.State.PLAYING or self._resuming
 
     def playing_video(self):
         return self.player.props.n_video > 0
@@ -21,11 +21,17 @@
 
 import os
 import logging
+import bisect
 import tempfile
+import itertools
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from gettext import gettext as _
 
+from gi.repository import GLib
 from gi.repository import GObject
 from gi.repository import Gio
+from gi.repository import Gdk
 from gi.repository import Gtk
 from gi.repository import Pango
 
@@ -33,26 +39,149 @@ from sugar3.datastore import datastore
 from sugar3.activity import activity
 from sugar3.graphics.icon import CellRendererIcon
 
+from tagreader import TagReader
+from mediacache import MediaCache
+from prober import Prober
 
-COLUMNS_NAME = ('index', 'title', 'available')
+
+# Each row holds its playlist item; the track number shown is the
+# position of the row
+COLUMNS_NAME = ('item', )
 COLUMNS = dict((name, i) for i, name in enumerate(COLUMNS_NAME))
 
+# Minimum number of journal:// paths kept resolved; longer playlists
+# keep one per track, so going through all of them never misses
+JOURNAL_CACHE_SIZE = 256
+
+# Number of tracks added right away when loading, enough to fill the
+# first screen, and then per main loop iteration
+LOAD_FIRST_BATCH = 50
+LOAD_BATCH_SIZE = 500
+
+# Threads checking whether the tracks are available, and the number
+# of tracks checked by each job
+AVAILABILITY_WORKERS = 4
+AVAILABILITY_BATCH_SIZE = 64
+
+# Rows read for tags after the last visible one, and how long the
+# view must stay still before they are read
+TAGS_LOOKAHEAD = 20
+TAGS_READ_DELAY = 200  # ms
+
+# Maximum number of directories watched for removed or restored tracks
+MAX_DIRECTORY_MONITORS = 64
+
+# Drag and drop target used to reorder the playlist
+ROW_TARGET = Gtk.TargetEntry.new('JUKEBOX_PLAYLIST_ROW',
+                                 Gtk.TargetFlags.SAME_WIDGET, 0)
+
+
+class PathIndex(object):
+    """Playlist items indexed by their file path.
+
+    The paths are also kept sorted, to find the items stored under a
+    directory (e.g. a mount point) without going through all of them.
+    """
+
+    def __init__(self):
+        self._paths = []
+        self._items = {}
+
+    def add(self, path, item):
+        items = self._items.get(path)
+        if items is None:
+            self._items[path] = [item]
+            bisect.insort(self._paths, path)
+        else:
+            items.append(item)
+
+    def remove(self, path, item):
+        items = self._items.get(path, [])
+        for i, indexed in enumerate(items):
+            if indexed is item:
+                del items[i]
+                break
+        if not items and path in self._items:
+            del self._items[path]
+            del self._paths[bisect.bisect_left(self._paths, path)]
+
+    def get(self, path):
+        return self._items.get(path, [])
+
+    def under(self, directory):
+        """Return the items with a path inside directory."""
+        prefix = os.path.join(directory, '')
+        items = []
+        for i in range(bisect.bisect_left(self._paths, prefix),
+                       len(self._paths)):
+            path = self._paths[i]
+            if not path.startswith(prefix):
+                break
+            items.extend(self._items[path])
+        return items
+
 
 class PlayList(Gtk.ScrolledWindow):
 
     __gsignals__ = {
         'play-index': (GObject.SignalFlags.RUN_FIRST, None, [int, str]),
-        'missing-tracks': (GObject.SignalFlags.RUN_FIRST, None, [object]), }
+        'missing-tracks': (GObject.SignalFlags.RUN_FIRST, None, [object]),
+        'load-progress': (GObject.SignalFlags.RUN_FIRST, None, [int, bool]),
+        # tracks were moved or removed
+        'changed': (GObject.SignalFlags.RUN_FIRST, None, []),
+        'playlist-duration': (GObject.SignalFlags.RUN_FIRST, None,
+                              [object]), }
 
     def __init__(self):
         self._current_playing = 0
         self._items = []
+        # Set by close(), the callbacks still pending then do nothing
+        self._closed = False
+
+        # Iterator over the entries still waiting to be added
+        self._pending_entries = None
+        self._loaded_entries = 0
+
+        # Availability checks, see _check_items()
+        self._checker = ThreadPoolExecutor(max_workers=AVAILABILITY_WORKERS)
+        self._checks_pending = 0
+        # Batches not done yet, cancelled by close()
+        self._check_futures = set()
+        self._check_serial = 0
+        self._report_missing = False
+
+        # Files of the tracks, to revalidate only the tracks affected
+        # by a mount or by a change in a watched directory
+        self._path_index = PathIndex()
+        self._monitors = {}
+
+        # Tags are read for the rows shown, see _read_visible_tags()
+        self._tag_reader = TagReader()
+        self._tag_reader.connect('tags-read', self.__tags_read_cb)
+        self._read_tags_id = -1
+
+        # What we learn about the files is kept between sessions
+        data_path = os.path.join(activity.get_activity_root(), 'data')
+        if not os.path.exists(data_path):
+            os.makedirs(data_path)
+        self.media_cache = MediaCache(
+            os.path.join(data_path, 'mediacache.db'))
+
+        # Probes all the tracks on request, see probe_all()
+        self._prober = Prober()
+        self._prober.connect('probed', self.__probed_cb)
+        self._prober.connect('finished', self.__probe_finished_cb)
+
+        # object_id -> file_path, least recently used first
+        self._journal_paths = OrderedDict()
+        datastore.updated.connect(self.__datastore_changed_cb)
+        datastore.deleted.connect(self.__datastore_changed_cb)
 
         Gtk.ScrolledWindow.__init__(self, hadjustment=None,
                                     vadjustment=None)
         self.set_policy(Gtk.PolicyType.NEVER, Gtk.PolicyType.AUTOMATIC)
         self.listview = Gtk.TreeView()
-        self.treemodel = Gtk.ListStore(int, object, bool)
+        self.treemodel = Gtk.ListStore(object)
         self.listview.set_model(self.treemodel)
         self.selection = self.listview.get_selection()
         self.selection.set_mode(Gtk.SelectionMode.SINGLE)
@@ -80,65 +209,129 @@ class PlayList(Gtk.ScrolledWindow):
         treecol_title.set_cell_data_func(renderer_title, self._set_title)
         self.listview.append_column(treecol_title)
 
+        renderer_time = Gtk.CellRendererText()
+        renderer_time.props.xalign = 1.0
+        treecol_time = Gtk.TreeViewColumn(_('Time'))
+        treecol_time.pack_start(renderer_time, False)
+        treecol_time.set_cell_data_func(renderer_time, self._set_time)
+        self.listview.append_column(treecol_time)
+
         # we don't support search in the playlist for the moment:
         self.listview.set_enable_search(False)
 
         self.listview.connect('row-activated', self.__on_row_activated)
         self.listview.connect('cursor-changed', self.__on_cursor_changed)
 
+        self.listview.enable_model_drag_source(
+            Gdk.ModifierType.BUTTON1_MASK, [ROW_TARGET],
+            Gdk.DragAction.MOVE)
+        self.listview.enable_model_drag_dest([ROW_TARGET],
+                                             Gdk.DragAction.MOVE)
+        self.listview.connect('drag-data-get', self.__drag_data_get_cb)
+        self.listview.connect('drag-data-received',
+                              self.__drag_data_received_cb)
+
+        self.get_vadjustment().connect('value-changed',
+                                       self.__scrolled_cb)
+
         self.add(self.listview)
 
     def __len__(self):
         return len(self._items)
 
-    def move_up(self):
+    def _get_selected_index(self):
         selected_iter = self.selection.get_selected()[1]
         if selected_iter is None:
-            return
+            return None
+        return self.treemodel.get_path(selected_iter).get_indices()[0]
 
-        position = self.treemodel.iter_previous(
-            self.treemodel.get_iter(self.treemodel.get_path(selected_iter)))
-        if position is None:
+    def move_up(self):
+        index = self._get_selected_index()
+        if index is None or index == 0:
             return
-
-        self.treemodel.move_before(selected_iter, position)
-        i = self._current_playing
-        self._items[i - 1], self._items[i] = \
-            self._items[i], self._items[i - 1]
-
-        index = 0
-        for tree_item, playlist_item in zip(self.treemodel, self._items):
-            tree_item[0] = index
-            index = index + 1
-
-        self._current_playing -= 1
+        self.move_rows(index, 1, index - 1)
 
     def move_down(self):
-        selected_iter = self.selection.get_selected()[1]
-        if selected_iter is None:
+        index = self._get_selected_index()
+        if index is None or index == len(self._items) - 1:
             return
+        self.move_rows(index, 1, index + 2)
 
-        position = self.treemodel.iter_next(
-            self.treemodel.get_iter(self.treemodel.get_path(selected_iter)))
-        if position is None:
+    def move_rows(self, start, count, dest):
+        """Move count rows starting at start before the row at dest.
+
+        dest is a position in the playlist before the move, and may be
+        len(self) to move the rows to the end. Track numbers are
+        derived from the row positions, so only the moved rows are
+        touched.
+        """
+        end = start + count
+        if count <= 0 or start <= dest <= end:
             return
 
-        self.treemodel.move_after(selected_iter, position)
-        i = self._current_playing
-        self._items[i + 1], self._items[i] = \
-            self._items[i], self._items[i + 1]
+        if dest < len(self._items):
+            target = self.treemodel.get_iter((dest, ))
+        else:
+            target = None
+
+        for i in range(count):
+            # Rows after the moved block keep their position when
+            # moving up, when moving down the next row of the block
+            # takes the place of the one just moved
+            offset = i if dest < start else 0
+            self.treemodel.move_before(
+                self.treemodel.get_iter((start + offset, )), target)
+
+        block = self._items[start:end]
+        del self._items[start:end]
+        new_start = dest if dest < start else dest - count
+        self._items[new_start:new_start] = block
+
+        current = self._current_playing
+        if start <= current < end:
+            self._current_playing = new_start + current - start
+        elif dest <= current < start:
+            self._current_playing = current + count
+        elif end <= current < dest:
+            self._current_playing = current - count
+        self.emit('changed')
+
+    def __drag_data_get_cb(self, treeview, context, selection_data, info,
+                           time):
+        index = self._get_selected_index()
+        if index is not None:
+            selection_data.set(selection_data.get_target(), 8,
+                               str(index).encode())
+
+    def __drag_data_received_cb(self, treeview, context, x, y,
+                                selection_data, info, time):
+        # The rows are moved here, don't let the TreeView insert and
+        # delete them through the model
+        treeview.stop_emission_by_name('drag-data-received')
+
+        data = selection_data.get_data()
+        if not data:
+            Gtk.drag_finish(context, False, False, time)
+            return
+        index = int(data)
 
-        index = 0
-        for tree_item, playlist_item in zip(self.treemodel, self._items):
-            tree_item[0] = index
-            index = index + 1
+        dest_row = treeview.get_dest_row_at_pos(x, y)
+        if dest_row is None:
+            dest = len(self._items)
+        else:
+            path, position = dest_row
+            dest = path.get_indices()[0]
+            if position in (Gtk.TreeViewDropPosition.AFTER,
+                            Gtk.TreeViewDropPosition.INTO_OR_AFTER):
+                dest += 1
 
-        self._current_playing += 1
+        self.move_rows(index, 1, dest)
+        Gtk.drag_finish(context, True, False, time)
 
     def __on_cursor_changed(self, treeview):
         sel_model, sel_rows = self.listview.get_selection().get_selected_rows()
         for row in sel_rows:
-            index = sel_model.get_value(sel_model.get_iter(row), 0)
+            index = row.get_indices()[0]
             if index != self._current_playing:
                 path = self._items[index]['path']
                 available = self._items[index]['available']
@@ -147,11 +340,7 @@ class PlayList(Gtk.ScrolledWindow):
                     self.emit('play-index', index, path)
 
     def __on_row_activated(self, treeview, path, col):
-        model = treeview.get_model()
-
-        treeiter = model.get_iter(path)
-        index = model.get_value(treeiter, COLUMNS['index'])
-        # TODO: put the path inside the ListStore
+        index = path.get_indices()[0]
         path = self._items[index]['path']
         available = self._items[index]['available']
         if available:
@@ -166,38 +355,173 @@ class PlayList(Gtk.ScrolledWindow):
         return self._current_playing
 
     def _set_number(self, column, cell, model, it, data):
-        idx = model.get_value(it, COLUMNS['index'])
+        idx = model.get_path(it).get_indices()[0]
         cell.set_property('text', str(idx + 1))
 
     def _set_title(self, column, cell, model, it, data):
-        title = model.get_value(it, COLUMNS['title'])
-        available = model.get_value(it, COLUMNS['available'])
+        item = model.get_value(it, COLUMNS['item'])
 
+        title = item['title']
+        if item.get('artist'):
+            title = '%s - %s' % (item['artist'], title)
         cell.set_property('text', title)
         sensitive = True
-        if not available:
+        if not item['available']:
             sensitive = False
         cell.set_property('sensitive', sensitive)
+        # tracks still being checked are shown in italics
+        if item['available'] is None:
+            cell.set_property('style', Pango.Style.ITALIC)
+        else:
+            cell.set_property('style', Pango.Style.NORMAL)
+
+    def _set_time(self, column, cell, model, it, data):
+        item = model.get_value(it, COLUMNS['item'])
+        duration = item.get('duration')
+        if duration is None or duration < 0:
+            cell.set_property('text', '')
+            return
+        seconds = duration * 10 ** -9
+        time = '%2d:%02d' % (int(seconds / 60), int(seconds % 60))
+        cell.set_property('text', time)
 
     def _set_icon(self, column, cell, model, it, data):
-        available = model.get_value(it, COLUMNS['available'])
-        cell.set_property('visible', not available)
+        item = model.get_value(it, COLUMNS['item'])
+        cell.set_property('visible', item['available'] is False)
+
+    def __scrolled_cb(self, adjustment):
+        self._queue_read_tags()
+
+    def _queue_read_tags(self):
+        # wait for the view to stay still
+        if self._read_tags_id != -1:
+            GObject.source_remove(self._read_tags_id)
+        self._read_tags_id = GObject.timeout_add(
+            TAGS_READ_DELAY, self.__read_tags_cb)
+
+    def __read_tags_cb(self):
+        self._read_tags_id = -1
+        if self._closed:
+            return False
+        self._read_visible_tags()
+        return False
+
+    def _read_visible_tags(self):
+        """Read the tags of the visible rows and a few after them."""
+        visible_range = self.listview.get_visible_range()
+        if visible_range is None:
+            return
+        start = visible_range[0].get_indices()[0]
+        end = visible_range[1].get_indices()[0] + TAGS_LOOKAHEAD
+
+        entries = []
+        for item in self._items[start:end + 1]:
+            if item.get('tags_read') or not item['available']:
+                continue
+            path = item['path']
+            if self.is_from_journal(path):
+                path = self.get_path_from_journal(path)
+            entries.append((item, path))
+        self._tag_reader.set_wanted(entries)
+
+    def __tags_read_cb(self, tag_reader, item):
+        if self._closed:
+            return
+        self.update_media_info(
+            item, **dict((key, item[key])
+                         for key in ('duration', 'title', 'artist', 'album')
+                         if item.get(key) is not None))
+        self.listview.queue_draw()
+
+    def update_media_info(self, item, **fields):
+        """Set fields of an item and remember them in the media cache."""
+        item.update(fields)
+        if 'mtime' in item and not self._closed:
+            self.media_cache.put(item['path'], item['mtime'], item['size'],
+                                 available=True, **fields)
+
+    def set_item_error(self, item):
+        """Mark the file of an item as one that can't be played."""
+        item['error'] = True
+        item['available'] = False
+        self.listview.queue_draw()
+
+    def probe_all(self):
+        """Probe all the available tracks in background processes, to
+        learn their durations and find the files that can't be played.
+
+        'playlist-duration' is emitted when done. Adding or removing
+        tracks cancels the probe.
+        """
+        entries = []
+        for item in self._items:
+            if not item['available']:
+                continue
+            path = item['path']
+            if self.is_from_journal(path):
+                path = self.get_path_from_journal(path)
+            entries.append((item, path))
+        self._prober.start(entries)
+
+    def __probed_cb(self, prober, item, result):
+        if self._closed:
+            return
+        if 'error' in result:
+            logging.info('%s can not be played: %s', item['path'],
+                         result['error'])
+            self.set_item_error(item)
+            return
+
+        item['tags_read'] = True
+        if item['title']:
+            # keep the title given by the playlist or the Journal
+            result.pop('title', None)
+        self.update_media_info(item, **result)
+        self.listview.queue_draw()
+
+    def __probe_finished_cb(self, prober):
+        if self._closed:
+            return
+        self.emit('playlist-duration', self.get_total_duration())
+
+    def get_total_duration(self):
+        """Return the sum of the known durations, in nanoseconds."""
+        return sum(item['duration'] for item in self._items
+                   if item.get('duration', -1) > 0)
+
+    def _apply_cached_info(self, item):
+        if item.get('tags_read'):
+            return
+        info = self.media_cache.get(item['path'], item['mtime'],
+                                    item['size'])
+        if info is None or 'duration' not in info:
+            return
+
+        # the tags were read in a previous session
+        item['tags_read'] = True
+        for key in ('duration', 'artist', 'album'):
+            if key in info:
+                item[key] = info[key]
+        if info.get('title') and not item['title']:
+            item['title'] = info['title']
 
     def _set_cursor(self, index):
         self.listview.set_cursor((index,))
 
     def delete_selected_items(self):
         sel_model, sel_rows = self.listview.get_selection().get_selected_rows()
-        for row in sel_rows:
-            index = sel_model.get_value(sel_model.get_iter(row), 0)
-            self._items.pop(index)
+        # the last rows first, so the positions of the others are kept
+        for row in reversed(sel_rows):
+            index = row.get_indices()[0]
+            item = self._items.pop(index)
+            if not self.is_from_journal(item['path']):
+                self._path_index.remove(item['path'], item)
             self.treemodel.remove(self.treemodel.get_iter(row))
-
-        # uptade the order numbers in the playlist
-        index = 0
-        for tree_item, playlist_item in zip(self.treemodel, self._items):
-            tree_item[0] = index
-            index = index + 1
+            if index < self._current_playing:
+                self._current_playing -= 1
+        if sel_rows:
+            self._prober.cancel()
+            self.emit('changed')
 
     def check_available_media(self, path):
         if self.is_from_journal(path):
@@ -208,22 +532,216 @@ class PlayList(Gtk.ScrolledWindow):
         else:
             return False
 
+    def _check_items(self, items):
+        """Check in the background whether the items are available.
+
+        The files are looked up by a pool of threads, so slow storage
+        does not block the main loop. Items are 'checking' (their
+        'available' is None) until the result of their batch comes
+        back to the main loop.
+        """
+        self._check_serial += 1
+        batch = []
+        for item in items:
+            path = item['path']
+            if self.is_from_journal(path):
+                path = self.get_path_from_journal(path)
+            item['available'] = None
+            item['check'] = self._check_serial
+            batch.append((item, path, self._check_serial))
+            if len(batch) == AVAILABILITY_BATCH_SIZE:
+                self._submit_check(batch)
+                batch = []
+        if batch:
+            self._submit_check(batch)
+        self.listview.queue_draw()
+
+    def _submit_check(self, batch):
+        self._checks_pending += 1
+        future = self._checker.submit(self._check_batch, batch)
+        self._check_futures.add(future)
+        future.add_done_callback(self._check_futures.discard)
+
+    def _check_batch(self, batch):
+        # This runs in a worker thread
+        results = []
+        try:
+            for item, path, serial in batch:
+                try:
+                    stat = os.stat(path)
+                except (OSError, TypeError, ValueError):
+                    stat = None
+                results.append((item, path, stat, serial))
+        finally:
+            GObject.idle_add(self.__check_done_cb, results)
+
+    def __check_done_cb(self, results):
+        if self._closed:
+            return False
+        for item, path, stat, serial in results:
+            # skip the results of a check made obsolete by a newer one
+            if item['check'] != serial:
+                continue
+            # files that can't be played stay unavailable
+            item['available'] = stat is not None and not item.get('error')
+            if stat is None:
+                continue
+
+            # the media cache is valid for this version of the file
+            item['mtime'] = stat.st_mtime
+            item['size'] = stat.st_size
+            self._apply_cached_info(item)
+
+            if path == item['path']:
+                self._watch_directory(os.path.dirname(path))
+        self._checks_pending -= 1
+        self.listview.queue_draw()
+
+        if self._checks_pending == 0:
+            # the tags are read only for the available tracks
+            self._queue_read_tags()
+
+        if self._checks_pending == 0 and self._report_missing:
+            self._report_missing = False
+            self._emit_missing_tracks()
+        return False
+
+    def _watch_directory(self, directory):
+        if directory in self._monitors or \
+                len(self._monitors) >= MAX_DIRECTORY_MONITORS:
+            return
+        try:
+            monitor = Gio.File.new_for_path(directory).monitor_directory(
+                Gio.FileMonitorFlags.NONE, None)
+        except GLib.Error as error:
+            logging.debug('Can not watch %s: %s', directory, error)
+            return
+        monitor.connect('changed', self.__directory_changed_cb)
+        self._monitors[directory] = monitor
+
+    def __directory_changed_cb(self, monitor, changed_file, other_file,
+                               event_type):
+        if event_type == Gio.FileMonitorEvent.DELETED:
+            available = False
+        elif event_type == Gio.FileMonitorEvent.CREATED:
+            available = True
+        else:
+            return
+
+        items = self._path_index.get(changed_file.get_path())
+        for item in items:
+            item['available'] = available and not item.get('error')
+            # a check still running is outdated now
+            item['check'] = None
+        if items:
+            self.listview.queue_draw()
+
+    def update_mount(self, mount_path, mounted):
+        """Revalidate the tracks stored under a mount point.
+
+        When the mount point was removed its tracks are missing, when
+        it was added they are checked again.
+        """
+        items = self._path_index.under(mount_path)
+        logging.debug('%s tracks under %s', len(items), mount_path)
+
+        prefix = os.path.join(mount_path, '')
+        for directory in list(self._monitors.keys()):
+            if os.path.join(directory, '').startswith(prefix):
+                self._monitors.pop(directory).cancel()
+
+        if mounted:
+            self._check_items(items)
+        else:
+            for item in items:
+                item['available'] = False
+                item['check'] = None
+            self.listview.queue_draw()
+
+    def _report_missing_tracks(self):
+        """Emit 'missing-tracks' once all the pending checks are done."""
+        if self._checks_pending == 0:
+            self._emit_missing_tracks()
+        else:
+            self._report_missing = True
+
+    def _emit_missing_tracks(self):
+        missing_tracks = self._get_missing_tracks()
+        if len(missing_tracks) > 0:
+            logging.info('%s tracks not found', len(missing_tracks))
+            self.emit('missing-tracks', missing_tracks)
+
     def _get_missing_tracks(self):
         missing_tracks = []
         for track in self._items:
-            if not track['available']:
+            if track['available'] is False and not track.get('error'):
                 missing_tracks.append(track)
         return missing_tracks
 
     def _load_m3u_playlist(self, file_path):
-        for uri in self._read_m3u_playlist(file_path):
-            self._add_track(uri['path'], uri['title'])
+        if self.is_from_journal(file_path):
+            file_path = self.get_path_from_journal(file_path)
+
+        # The file is opened right away, the caller may remove it
+        # before all the entries were read
+        self._add_entries(self._parse_m3u(open(file_path)))
 
     def _load_stream(self, file_path, title=None):
-        # TODO: read id3 here
+        # the tags are read by _read_visible_tags()
         if os.path.islink(file_path):
             file_path = os.path.realpath(file_path)
-        self._add_track(file_path, title)
+        self._add_entries([{'path': file_path, 'title': title}])
+
+    def _add_entries(self, entries):
+        """Add the tracks of an iterable of {'path', 'title'} entries.
+
+        The first LOAD_FIRST_BATCH tracks are added right away and the
+        rest in batches from an idle handler, so a long playlist does
+        not block the activity. 'load-progress' is emitted after each
+        batch.
+        """
+        if self._pending_entries is not None:
+            # Still loading, these entries go after the pending ones
+            self._pending_entries = itertools.chain(
+                self._pending_entries, entries)
+            return
+
+        self._pending_entries = iter(entries)
+        self._loaded_entries = 0
+        if self._load_batch(LOAD_FIRST_BATCH):
+            GObject.idle_add(self.__load_idle_cb)
+
+    def __load_idle_cb(self):
+        if self._closed:
+            self._pending_entries = None
+            return False
+        return self._load_batch(LOAD_BATCH_SIZE)
+
+    def _load_batch(self, size):
+        """Add up to size pending entries.
+
+        Return True if there are entries left to be added.
+        """
+        try:
+            entries = list(itertools.islice(self._pending_entries, size))
+        except (OSError, ValueError):
+            logging.exception('Error reading the playlist')
+            entries = []
+        self.add_tracks(entries)
+        added = len(entries)
+        self._loaded_entries += added
+
+        if added == size:
+            self.emit('load-progress', self._loaded_entries, False)
+            return True
+
+        self._pending_entries = None
+        self.emit('load-progress', self._loaded_entries, True)
+        self._report_missing_tracks()
+        return False
+
+    def is_loading(self):
+        return self._pending_entries is not None
 
     def load_file(self, jobject, title=None):
         if isinstance(jobject, datastore.RawObject):
@@ -240,11 +758,25 @@ class PlayList(Gtk.ScrolledWindow):
             logging.debug('Loading a %s', type(jobject))
             file_path = mime_path = jobject
 
-        info = Gio.File.new_for_path(mime_path).query_info(
-            Gio.FILE_ATTRIBUTE_STANDARD_SIZE + ',' +
-            Gio.FILE_ATTRIBUTE_STANDARD_CONTENT_TYPE, 0, None)
-        size = info.get_size()
-        mime = info.get_content_type()
+        # Files copied into the activity instance are not cached, they
+        # get a new name every time
+        cacheable = not file_path.startswith(activity.get_activity_root())
+
+        stat = os.stat(mime_path)
+        size = stat.st_size
+        cached = None
+        if cacheable:
+            cached = self.media_cache.get(file_path, stat.st_mtime, size)
+
+        if cached is not None and 'mime' in cached:
+            mime = cached['mime']
+        else:
+            info = Gio.File.new_for_path(mime_path).query_info(
+                Gio.FILE_ATTRIBUTE_STANDARD_CONTENT_TYPE, 0, None)
+            mime = info.get_content_type()
+            if cacheable:
+                self.media_cache.put(file_path, stat.st_mtime, size,
+                                     mime=mime)
 
         if size != 0:
             logging.debug('read_file mime %s', mime)
@@ -258,49 +790,123 @@ class PlayList(Gtk.ScrolledWindow):
             logging.debug('read_file is empty')
             self._load_m3u_playlist(file_path)
 
-        missing_tracks = self._get_missing_tracks()
-        if len(missing_tracks) > 0:
-            logging.info('%s tracks not found', len(missing_tracks))
-            self.emit('missing-tracks', missing_tracks)
-
         # set the focus in the first row
         self._set_cursor(0)
 
     def update(self):
-        for tree_item, playlist_item in zip(self.treemodel, self._items):
-            tree_item[2] = playlist_item['available'] = \
-                self.check_available_media(playlist_item['path'])
+        self._check_items(self._items)
+
+    def close(self):
+        """Stop the pending background work."""
+        if self._closed:
+            return
+        self._closed = True
+        if self._read_tags_id != -1:
+            GObject.source_remove(self._read_tags_id)
+            self._read_tags_id = -1
+        # shutdown(cancel_futures=True) needs Python 3.9
+        for future in list(self._check_futures):
+            future.cancel()
+        self._checker.shutdown(wait=False)
+        self._tag_reader.stop()
+        self.media_cache.close()
+        self._prober.shutdown()
+        for monitor in self._monitors.values():
+            monitor.cancel()
+        self._monitors = {}
+
+    def add_tracks(self, entries):
+        """Add a list of {'path', 'title'} entries to the playlist.
+
+        When more rows are added than the playlist already has, the
+        model is detached from the TreeView while they are inserted:
+        the view then builds its rows once when the model is set back
+        instead of handling every 'row-inserted'. Rebuilding costs as
+        much as the rows already in the view, so small additions to a
+        long playlist are inserted with the model attached.
+        """
+        if entries:
+            self._prober.cancel()
+
+        detach = len(entries) > len(self.treemodel)
+        if detach:
+            vadjustment = self.get_vadjustment()
+            scroll = vadjustment.get_value()
+            cursor = self.listview.get_cursor()[0]
+            self.listview.set_model(None)
+
+        items = []
+        try:
+            for entry in entries:
+                items.append(self._add_track(entry['path'], entry['title']))
+        finally:
+            if detach:
+                self.listview.set_model(self.treemodel)
+                if cursor is not None:
+                    self.listview.set_cursor(cursor)
+                vadjustment.set_value(scroll)
+
+        self._check_items(items)
 
     def _add_track(self, file_path, title):
-        available = self.check_available_media(file_path)
+        # available is set by _check_items()
         item = {'path': file_path,
                 'title': title,
-                'available': available}
+                'available': None}
         self._items.append(item)
-        index = len(self._items) - 1
-        self.treemodel.append((index, item['title'], available))
+        self.treemodel.append((item, ))
+        if not self.is_from_journal(file_path):
+            self._path_index.add(file_path, item)
+        return item
 
     def _read_m3u_playlist(self, file_path):
-        urls = []
-        title = ''
-
         if self.is_from_journal(file_path):
             file_path = self.get_path_from_journal(file_path)
 
-        for line in open(file_path).readlines():
-            line = line.strip()
-            if line != '':
-                if line.startswith('#EXTINF:'):
-                    # line with data
-                    # EXTINF:title
-                    title = line[len('#EXTINF:'):]
-                else:
-                    uri = {}
-                    uri['path'] = line.strip()
-                    uri['title'] = title
-                    urls.append(uri)
-                    title = ''
-        return urls
+        return list(self._parse_m3u(open(file_path)))
+
+    def _parse_m3u(self, m3u_file):
+        """Yield the entries of an open M3U file while reading it."""
+        title = ''
+
+        with m3u_file:
+            for line in m3u_file:
+                line = line.strip()
+                if line != '':
+                    if line.startswith('#EXTINF:'):
+                        # line with data
+                        # EXTINF:title
+                        title = line[len('#EXTINF:'):]
+                    else:
+                        uri = {}
+                        uri['path'] = line
+                        uri['title'] = title
+                        yield uri
+                        title = ''
+
+    def write_m3u(self, file_path):
+        """Open the file at file_path and write the playlist.
+
+        It is saved in audio/x-mpegurl format. The entries not added
+        yet when still loading are written too.
+
+        """
+        entries = self._items
+        if self._pending_entries is not None:
+            # read the rest of the playlist now, the loading goes on
+            # from the entries read
+            try:
+                pending = list(self._pending_entries)
+            except (OSError, ValueError):
+                logging.exception('Error reading the playlist')
+                pending = []
+            self._pending_entries = iter(pending)
+            entries = itertools.chain(self._items, pending)
+
+        with open(file_path, 'w') as list_file:
+            for uri in entries:
+                list_file.write('#EXTINF:%s\n' % uri['title'])
+                list_file.write('%s\n' % uri['path'])
 
     def create_playlist_jobject(self):
         """Create an object in the Journal to store the playlist.
@@ -329,4 +935,19 @@ class PlayList(Gtk.ScrolledWindow):
 
     def get_path_from_journal(self, path):
         object_id = path[len('journal://'):]
-        return datastore.get(object_id).file_path
+
+        file_path = self._journal_paths.pop(object_id, None)
+        if file_path is None or not os.path.exists(file_path):
+            # Not cached yet, or the datastore removed its copy of
+            # the file: ask the datastore (a D-Bus round trip)
+            file_path = datastore.get(object_id).file_path
+
+        self._journal_paths[object_id] = file_path
+        if len(self._journal_paths) > max(JOURNAL_CACHE_SIZE,
+                                          len(self._items)):
+            self._journal_paths.popitem(last=False)
+        return file_path
+
+    def __datastore_changed_cb(self, sender, object_id=None, **kwargs):
+        if self._journal_paths.pop(object_id, None) is not None:
+            logging.debug('Journal entry %s changed', object_id)
@@ -0,0 +1,113 @@
+# Copyright (C) 2026 Sugar Labs
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA 02111-1307
+# USA
+
+import os
+import time
+import logging
+import threading
+
+# Wait before reading, to leave the device to the track starting
+PREFETCH_DELAY = 5  # seconds
+# Bytes read from the start of the file
+PREFETCH_BYTES = 16 * 1024 * 1024
+# Read speed limit, so the current track is not starved on slow
+# devices
+PREFETCH_RATE = 2 * 1024 * 1024  # bytes per second
+CHUNK_SIZE = 256 * 1024
+
+
+class Prefetcher(object):
+    """Read the start of a file in the background, so it is in the
+    page cache when it is played.
+
+    Only the file last passed to prefetch() is read, asking for
+    another one stops the current read.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._path = None
+        self._serial = 0
+        self._stopped = False
+        self._thread = None
+
+    def prefetch(self, path):
+        with self._lock:
+            self._path = path
+            self._serial += 1
+        self._wake.set()
+
+        if self._thread is None and path is not None:
+            self._thread = threading.Thread(target=self._run,
+                                            name='prefetch')
+            self._thread.daemon = True
+            self._thread.start()
+
+    def cancel(self):
+        self.prefetch(None)
+
+    def stop(self):
+        self._stopped = True
+        self.cancel()
+
+    def _current(self, serial):
+        return not self._stopped and serial == self._serial
+
+    def _run(self):
+        while not self._stopped:
+            self._wake.wait()
+            self._wake.clear()
+            with self._lock:
+                path = self._path
+                serial = self._serial
+            if path is None:
+                continue
+
+            # a new request during the delay starts over
+            if self._wake.wait(PREFETCH_DELAY) or not self._current(serial):
+                continue
+            try:
+                self._read(path, serial)
+            except EnvironmentError as error:
+                logging.debug('Can not prefetch %s: %s', path, error)
+
+    def _read(self, path, serial):
+        start = time.time()
+        done = 0
+        fd = os.open(path, os.O_RDONLY)
+        try:
+            if hasattr(os, 'posix_fadvise'):
+                # the kernel reads ahead on its own, as fast as it can
+                os.posix_fadvise(fd, 0, PREFETCH_BYTES,
+                                 os.POSIX_FADV_WILLNEED)
+
+            while done < PREFETCH_BYTES and self._current(serial):
+                data = os.read(fd, CHUNK_SIZE)
+                if not data:
+                    break
+                done += len(data)
+
+                ahead = done / float(PREFETCH_RATE) - (time.time() - start)
+                if ahead > 0:
+                    # woken up early by a new request
+                    self._wake.wait(ahead)
+        finally:
+            os.close(fd)
+
+        logging.debug('Prefetched %d bytes of %s in %.2f s', done, path,
+                      time.time() - start)
@@ -0,0 +1,183 @@
+# Copyright (C) 2026 Sugar Labs
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA 02111-1307
+# USA
+
+"""Probe many media files with GstPbutils.Discoverer in parallel.
+
+Prober runs this file as a script in several processes. Each one
+reads JSON encoded file paths on stdin and answers one JSON object
+per line on stdout. A decoder crashing only takes its process down.
+"""
+
+import os
+import sys
+import json
+import logging
+from collections import deque
+
+import gi
+gi.require_version('Gst', '1.0')
+gi.require_version('GstPbutils', '1.0')
+
+from gi.repository import GLib
+from gi.repository import Gio
+from gi.repository import GObject
+from gi.repository import Gst
+from gi.repository import GstPbutils
+
+from tagreader import read_tags
+
+# Time given to GStreamer to discover a file
+PROBE_TIMEOUT = 10 * Gst.SECOND
+
+
+def probe(discoverer, path):
+    """Return a dict with the tags and duration of path, or with an
+    'error' when it can not be played."""
+    try:
+        info = discoverer.discover_uri(Gst.filename_to_uri(path))
+    except GLib.Error as error:
+        return {'error': error.message}
+
+    if info.get_result() != GstPbutils.DiscovererResult.OK:
+        return {'error': str(info.get_result())}
+    if not info.get_audio_streams() and not info.get_video_streams():
+        return {'error': 'no audio or video'}
+    return read_tags(info)
+
+
+def main():
+    Gst.init(None)
+    discoverer = GstPbutils.Discoverer.new(PROBE_TIMEOUT)
+    for line in sys.stdin:
+        result = probe(discoverer, json.loads(line))
+        sys.stdout.write(json.dumps(result) + '\n')
+        sys.stdout.flush()
+
+
+class Prober(GObject.GObject):
+    """Probe playlist items in a pool of processes.
+
+    'probed' is emitted with the item and the result of probe() for
+    every item, and 'finished' once all of them are done.
+    """
+
+    __gsignals__ = {
+        'probed': (GObject.SignalFlags.RUN_FIRST, None, [object, object]),
+        'finished': (GObject.SignalFlags.RUN_FIRST, None, []), }
+
+    def __init__(self, workers=None):
+        GObject.GObject.__init__(self)
+
+        self._max_workers = workers or os.cpu_count() or 1
+        self._workers = []
+        self._queue = deque()
+        self._pending = 0
+        # results of a previous start() are ignored
+        self._serial = 0
+        # set by shutdown(), the reads still pending then do nothing
+        self._shut_down = False
+
+    def start(self, entries):
+        """Probe a list of (item, file path) entries."""
+        self.cancel()
+        self._queue.extend(entries)
+        self._pending = len(self._queue)
+        if self._pending == 0:
+            self.emit('finished')
+            return
+
+        while len(self._workers) < min(self._max_workers, self._pending):
+            self._workers.append(self._spawn())
+        for worker in self._workers:
+            if worker['entry'] is None:
+                self._feed(worker)
+
+    def cancel(self):
+        self._serial += 1
+        self._queue.clear()
+        self._pending = 0
+
+    def is_running(self):
+        return self._pending > 0
+
+    def shutdown(self):
+        self._shut_down = True
+        self.cancel()
+        for worker in self._workers:
+            worker['process'].force_exit()
+        self._workers = []
+
+    def _spawn(self):
+        process = Gio.Subprocess.new(
+            [sys.executable, os.path.abspath(__file__)],
+            Gio.SubprocessFlags.STDIN_PIPE | Gio.SubprocessFlags.STDOUT_PIPE)
+        return {'process': process,
+                'stdin': process.get_stdin_pipe(),
+                'stdout': Gio.DataInputStream.new(
+                    process.get_stdout_pipe()),
+                'entry': None,
+                'serial': None}
+
+    def _feed(self, worker):
+        if not self._queue:
+            worker['entry'] = None
+            return
+
+        worker['entry'] = self._queue.popleft()
+        worker['serial'] = self._serial
+        path = worker['entry'][1]
+        worker['stdin'].write_all((json.dumps(path) + '\n').encode(), None)
+        worker['stdout'].read_line_async(GLib.PRIORITY_DEFAULT, None,
+                                         self.__line_read_cb, worker)
+
+    def __line_read_cb(self, stream, result, worker):
+        try:
+            line = stream.read_line_finish_utf8(result)[0]
+        except GLib.Error as error:
+            if self._shut_down:
+                return
+            logging.error('Probe failed: %s', error)
+            line = None
+
+        if self._shut_down:
+            return
+
+        if line is None:
+            # the process died, most likely in a decoder
+            if worker in self._workers:
+                self._workers.remove(worker)
+            answer = {'error': 'crashed'}
+        else:
+            answer = json.loads(line)
+
+        if worker['serial'] == self._serial:
+            self._pending -= 1
+            self.emit('probed', worker['entry'][0], answer)
+            if self._pending == 0:
+                self.emit('finished')
+
+        if line is None:
+            if self._queue:
+                worker = self._spawn()
+                self._workers.append(worker)
+            else:
+                return
+        self._feed(worker)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,110 @@
+# Copyright (C) 2026 Sugar Labs
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA 02111-1307
+# USA
+
+import os
+import json
+import time
+import logging
+from collections import deque
+
+# Measures kept for every operation, the oldest go first
+WINDOW = 200
+PERCENTILES = (50, 90, 99)
+# 'log' to log the stats when the activity closes, or the path of a
+# JSON file to write them to
+DUMP_ENV = 'JUKEBOX_STATS'
+
+
+class PlaybackStats(object):
+    """Time taken by the playback operations.
+
+    start() and stop() measure an operation by name; stop() does
+    nothing if the operation was not started, so the end of an
+    operation can be reported from every place it may happen. They
+    can be called from the GStreamer streaming threads.
+    """
+
+    def __init__(self, window=WINDOW):
+        self._window = window
+        # name -> time the operation started
+        self._started = {}
+        # name -> latest durations, in seconds
+        self._durations = {}
+        # name -> number of measures since the start
+        self._counts = {}
+
+    def start(self, name):
+        self._started[name] = time.perf_counter()
+
+    def stop(self, name):
+        started = self._started.pop(name, None)
+        if started is not None:
+            self.add(name, time.perf_counter() - started)
+
+    def cancel(self, *names):
+        for name in names:
+            self._started.pop(name, None)
+
+    def add(self, name, seconds):
+        if name not in self._durations:
+            self._durations[name] = deque(maxlen=self._window)
+            self._counts[name] = 0
+        self._durations[name].append(seconds)
+        self._counts[name] += 1
+
+    def percentile(self, name, percent):
+        """Return the percentile of the latest durations of name, in
+        seconds, or None if it was never measured."""
+        durations = sorted(self._durations.get(name, ()))
+        if not durations:
+            return None
+        # nearest rank
+        rank = max(0, -(-percent * len(durations) // 100) - 1)
+        return durations[int(rank)]
+
+    def summary(self):
+        """Return a dict with, for every operation, the number of
+        measures and the percentiles of the latest ones in ms."""
+        summary = {}
+        for name, durations in self._durations.items():
+            entry = {'count': self._counts[name],
+                     'max_ms': round(max(durations) * 1000, 3)}
+            for percent in PERCENTILES:
+                entry['p%d_ms' % percent] = round(
+                    self.percentile(name, percent) * 1000, 3)
+            summary[name] = entry
+        return summary
+
+    def dump(self):
+        """Log the summary or write it to a JSON file, as asked by
+        the JUKEBOX_STATS environment variable."""
+        destination = os.environ.get(DUMP_ENV)
+        if not destination:
+            return
+
+        summary = self.summary()
+        if destination == 'log':
+            for name, entry in sorted(summary.items()):
+                logging.info('Playback stats: %s %s', name,
+                             json.dumps(entry, sort_keys=True))
+            return
+
+        try:
+            with open(destination, 'w') as stats_file:
+                json.dump(summary, stats_file, indent=2, sort_keys=True)
+        except EnvironmentError as error:
+            logging.error('Can not write the playback stats: %s', error)
@@ -0,0 +1,107 @@
+# Copyright (C) 2026 Sugar Labs
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA 02111-1307
+# USA
+
+import logging
+
+from gi.repository import Gst
+from gi.repository import GstPbutils
+from gi.repository import GObject
+
+# Time given to GStreamer to discover a file
+DISCOVER_TIMEOUT = 5 * Gst.SECOND
+
+
+def read_tags(info):
+    """Return a dict with the tags and duration found in a
+    GstPbutils.DiscovererInfo"""
+
+    tags = {'duration': info.get_duration()}
+
+    taglist = info.get_tags()
+    if taglist is not None:
+        for key, tag in (('title', Gst.TAG_TITLE),
+                         ('artist', Gst.TAG_ARTIST),
+                         ('album', Gst.TAG_ALBUM)):
+            found, value = taglist.get_string(tag)
+            if found:
+                tags[key] = value
+    return tags
+
+
+class TagReader(GObject.GObject):
+    """Read the tags of playlist items in the background.
+
+    Only the items last passed to set_wanted() are read, so the
+    playlist asks for the rows it shows and the work for the rows
+    scrolled away is cancelled.
+    """
+
+    __gsignals__ = {
+        'tags-read': (GObject.SignalFlags.RUN_FIRST, None, [object]), }
+
+    def __init__(self):
+        GObject.GObject.__init__(self)
+
+        # uri -> items waiting for its tags
+        self._pending = {}
+
+        self._discoverer = GstPbutils.Discoverer.new(DISCOVER_TIMEOUT)
+        self._discoverer.connect('discovered', self.__discovered_cb)
+        self._discoverer.start()
+
+    def set_wanted(self, entries):
+        """Read the tags of a list of (item, file path) entries.
+
+        Items asked before and not in entries are not read anymore.
+        """
+        wanted = {}
+        for item, path in entries:
+            wanted.setdefault(Gst.filename_to_uri(path), []).append(item)
+
+        if any(uri not in wanted for uri in self._pending):
+            # The discoverer can only cancel all its work
+            self._discoverer.stop()
+            self._pending = {}
+            self._discoverer.start()
+
+        for uri, items in wanted.items():
+            if uri not in self._pending:
+                self._discoverer.discover_uri_async(uri)
+            self._pending[uri] = items
+
+    def stop(self):
+        self._discoverer.stop()
+        self._pending = {}
+
+    def __discovered_cb(self, discoverer, info, error):
+        items = self._pending.pop(info.get_uri(), [])
+
+        if info.get_result() == GstPbutils.DiscovererResult.OK:
+            tags = read_tags(info)
+        else:
+            logging.debug('Can not read the tags of %s: %s',
+                          info.get_uri(), error)
+            tags = {}
+
+        for item in items:
+            # don't try again, even if it failed
+            item['tags_read'] = True
+            for key, value in tags.items():
+                # keep the title given by the playlist or the Journal
+                if key != 'title' or not item['title']:
+                    item[key] = value
+            self.emit('tags-read', item)
@@ -25,6 +25,8 @@ from gi.repository import Gtk
 
 from sugar3.graphics.toolbutton import ToolButton
 from sugar3.graphics.toggletoolbutton import ToggleToolButton
+from sugar3.graphics.palettemenu import PaletteMenuBox
+from sugar3.graphics.palettemenu import PaletteMenuItem
 
 
 class ViewToolbar(Gtk.Toolbar):
@@ -36,7 +38,13 @@ class ViewToolbar(Gtk.Toolbar):
                           ([])),
         'toggle-playlist': (GObject.SignalFlags.RUN_FIRST,
                             None,
-                            ([]))
+                            ([])),
+        'visualization-changed': (GObject.SignalFlags.RUN_FIRST,
+                                  None,
+                                  ([str])),
+        'toggle-audio-only': (GObject.SignalFlags.RUN_FIRST,
+                              None,
+                              ([]))
     }
 
     def __init__(self):
@@ -57,6 +65,49 @@ class ViewToolbar(Gtk.Toolbar):
         self.insert(self._fullscreen, -1)
         self._fullscreen.show()
 
+        self._visualization = ToolButton('audio-x-generic')
+        self._visualization.set_tooltip(_('Visualization'))
+        self._visualization.connect('clicked', self._visualization_cb)
+        self._visualization_box = PaletteMenuBox()
+        self._visualization.get_palette().set_content(
+            self._visualization_box)
+        self._visualization_box.show()
+        self.insert(self._visualization, -1)
+        self._visualization.show()
+
+        self._audio_only = ToggleToolButton('speaker-100')
+        self._audio_only.set_tooltip(_('Audio only'))
+        self._audio_only.connect('toggled', self._audio_only_toggled_cb)
+        self.insert(self._audio_only, -1)
+        self._audio_only.show()
+
+    def get_audio_only(self):
+        return self._audio_only.get_active()
+
+    def set_audio_only(self, audio_only):
+        self._audio_only.set_active(audio_only)
+
+    def _audio_only_toggled_cb(self, button):
+        self.emit('toggle-audio-only')
+
+    def set_visualizations(self, visualizations):
+        """Offer a list of (element name, description) visualisations,
+        the choice is emitted with 'visualization-changed'."""
+        for item in self._visualization_box.get_children():
+            self._visualization_box.remove(item)
+        for name, description in visualizations:
+            item = PaletteMenuItem(description)
+            item.connect('activate', self._visualization_activate_cb, name)
+            self._visualization_box.append_item(item)
+            item.show()
+        self._visualization.set_sensitive(bool(visualizations))
+
+    def _visualization_cb(self, button):
+        button.get_palette().popup(immediate=True)
+
+    def _visualization_activate_cb(self, item, name):
+        self.emit('visualization-changed', name)
+
     def _fullscreen_cb(self, button):
         self.emit('go-fullscreen')
 